@@ -1,27 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
+import multiprocessing
 import sys
 
 # General day 2 stuff
 
-def exec(ctx, idx):
-  # pad out ctx if we're at the end.
-  if len(ctx) < idx+4:
-    ctx = ctx + [0,0,0,0]
-  instr, arg1, arg2, out = ctx[idx:idx+4]
-  if instr == 1:
-    ctx[out] = ctx[arg1] + ctx[arg2]
-    return True
-  elif instr == 2:
-    ctx[out] = ctx[arg1] * ctx[arg2]
-    return True
-  elif instr == 99:
-    return False
-  else:
-    raise Exception("bad instruction: %s at index %d" % (instr, idx))
-
-
 def load(f):
   contents = []
   for line in f:
@@ -33,20 +17,177 @@ def run(ctx, noun, verb):
   ctx[1] = noun
   ctx[2] = verb
   idx = 0
-  while exec(ctx, idx * 4):
-    idx += 1
-  return ctx[0]
+  while True:
+    instr = ctx[idx]
+    if instr == 1:
+      ctx[ctx[idx + 3]] = ctx[ctx[idx + 1]] + ctx[ctx[idx + 2]]
+    elif instr == 2:
+      ctx[ctx[idx + 3]] = ctx[ctx[idx + 1]] * ctx[ctx[idx + 2]]
+    elif instr == 99:
+      return ctx[0]
+    else:
+      raise Exception("bad instruction: %s at index %d" % (instr, idx))
+    idx += 4
+
+
+def search_serial(ctx, target):
+  memory = list(ctx)
+  for noun in range(100):
+    for verb in range(100):
+      memory[:] = ctx
+      if run(memory, noun, verb) == target:
+        return (noun, verb)
+  return None
+
+
+# Per worker state for the pool search, set up once by _init_worker.
+_image = None
+_memory = None
+_stop = None
+
+def _init_worker(ctx, stop):
+  global _image, _memory, _stop
+  _image = ctx
+  _memory = list(ctx)
+  _stop = stop
+
+
+def _search_noun(task):
+  noun, target = task
+  if _stop.is_set():
+    return None
+  for verb in range(100):
+    # Reset the one buffer instead of copying the program for every run.
+    _memory[:] = _image
+    if run(_memory, noun, verb) == target:
+      _stop.set()
+      return (noun, verb)
+  return None
+
+
+def search_pool(ctx, target, processes=None):
+  """Same as search_serial, with each noun searched by a pool worker.
+
+  Workers stop picking up nouns once any of them has found a match.
+  """
+  stop = multiprocessing.Event()
+  with multiprocessing.Pool(processes, _init_worker, (ctx, stop)) as pool:
+    tasks = [ (noun, target) for noun in range(100) ]
+    for found in pool.imap_unordered(_search_noun, tasks):
+      if found:
+        # Leaving the with block terminates whatever is left.
+        return found
+  return None
+
+
+class NotLinear(Exception):
+  pass
+
+
+class Linear(object):
+  """c + n * noun + v * verb"""
+  def __init__(self, c, n=0, v=0):
+    self.c = c
+    self.n = n
+    self.v = v
+
+  def constant(self):
+    return self.n == 0 and self.v == 0
+
+  def __add__(self, other):
+    return Linear(self.c + other.c, self.n + other.n, self.v + other.v)
+
+  def __mul__(self, other):
+    if other.constant():
+      self, other = other, self
+    if not self.constant():
+      raise NotLinear()
+    k = self.c
+    return Linear(k * other.c, k * other.n, k * other.v)
+
+  def __repr__(self):
+    return "%d + %d*noun + %d*verb" % (self.c, self.n, self.v)
+
+
+def run_symbolic(ctx):
+  """Runs the program with noun & verb left as unknowns.
+
+  Reading through an address that depends on them gives a value that isn't
+  known at all (None), which is fine as long as it's overwritten before it
+  matters. Raises NotLinear if the output isn't linear in noun & verb, or
+  if they end up being used as the address of a write.
+  """
+  mem = [ Linear(i) for i in ctx ]
+  mem[1] = Linear(0, n=1)
+  mem[2] = Linear(0, v=1)
+
+  def addr(term):
+    if term is None or not term.constant():
+      raise NotLinear()
+    return term.c
+
+  def read(term):
+    if term is None or not term.constant():
+      return None
+    return mem[term.c]
+
+  idx = 0
+  while True:
+    instr = addr(mem[idx])
+    if instr == 99:
+      break
+    a = read(mem[idx + 1])
+    b = read(mem[idx + 2])
+    out = addr(mem[idx + 3])
+    if a is None or b is None:
+      mem[out] = None
+    elif instr == 1:
+      mem[out] = a + b
+    elif instr == 2:
+      mem[out] = a * b
+    else:
+      raise Exception("bad instruction: %s at index %d" % (instr, idx))
+    idx += 4
+
+  if mem[0] is None:
+    raise NotLinear()
+  return mem[0]
+
+
+def solve(ctx, target):
+  """Solves for (noun, verb) directly, without running the search."""
+  out = run_symbolic(ctx)
+  for noun in range(100):
+    rest = target - out.c - out.n * noun
+    if out.v == 0:
+      if rest == 0:
+        return (noun, 0)
+    elif rest % out.v == 0 and 0 <= rest // out.v < 100:
+      return (noun, rest // out.v)
+  return None
 
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser()
   parser.add_argument('input', type=argparse.FileType('r'), nargs='?', default=sys.stdin)
+  parser.add_argument('--target', default=19690720, type=int)
+  parser.add_argument('--mode', default='symbolic', choices=['symbolic', 'pool', 'serial'])
+  parser.add_argument('--processes', default=None, type=int)
 
   args = parser.parse_args(sys.argv[1:])
   ctx = load(args.input)
-  for x in range(100):
-    for y in range(100):
-      out = run(list(ctx), x, y)
-      if out == 19690720:
-        print(x, y)
 
+  found = None
+  if args.mode == 'symbolic':
+    try:
+      found = solve(ctx, args.target)
+    except NotLinear:
+      print("not linear, searching instead")
+      args.mode = 'pool'
+  if args.mode == 'pool':
+    found = search_pool(ctx, args.target, args.processes)
+  elif args.mode == 'serial':
+    found = search_serial(ctx, args.target)
+
+  if found:
+    print(*found)
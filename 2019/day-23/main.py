@@ -4,207 +4,84 @@ import argparse
 import enum
 import functools
 import collections
+import os
 import sys
+import time
 
-# General day 2 stuff
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from intcode import IntCode, IntCodeProfile, IntCodeProgramType, WaitForInput
 
-class IntCodeProgramType(object):
-  def __repr__(self):
-    return 'IntCodeProgramType'
-
-  def __call__(self, string):
-    f = None
-    if string == "-":
-      f = sys.stdin
-    else:
-      f = open(string, mode='r')
-
-    # We plan to consume all of the contents. 
-    try:
-      contents = []
-      for line in f:
-        line = line.strip()
-        if not line or line.startswith("#"):
-          continue
-        contents.extend(line.split(','))
-      return [ int(i) for i in contents ]
-    finally:
-      f.close()
-
-
-IntCodeStatus = collections.namedtuple("IntCodeStatus", ["status", "value"])
-
-class IntCode(object):
-
-  INSTR_ZERO= set([99])
-  INSTR_ONE = set([3, 4, 9])
-  INSTR_TWO = set([5, 6])
-  INSTR_THREE= set([1, 2, 7, 8])
-
-  def __init__(self, size, io_in, io_out):
-    self.memory = [0] * size
-    self.relative_offset = 0
-    self.program_counter = 0
-    self.cycle_counter = 0
-    self.steps = -1
-    self.io_in = io_in
-    self.io_out = io_out
-
-  def instr_args(self, instr):
-    """returns the number of arguments for a given instruction"""
-    if instr in IntCode.INSTR_ZERO:
-      return 0
-    elif instr in IntCode.INSTR_ONE:
-      return 1
-    elif instr in IntCode.INSTR_TWO:
-      return 2
-    elif instr in IntCode.INSTR_THREE:
-      return 3
-    else:
-      raise Exception("Illegal instruction: %s" % str(instr))
-
-  def decode_modes(self, instr):
-    return ((instr // 10000) % 10,
-            (instr // 1000) % 10,
-            (instr // 100) % 10,
-            (instr % 100))
-
-  def exec(self):
-    pc = self.program_counter
-    pinstr = self.memory[pc]
-    # Not all modes may be applicable, they're fetched anyway.
-    mode2, mode1, mode0, instr = self.decode_modes(pinstr)
-    argc = self.instr_args(instr)
-    args = self.memory[pc + 1:pc + 1 + argc]
-    
-    self.cycle_counter += 1
-    # Jumps reset this later.
-    self.program_counter += argc + 1
-    if instr == 1:
-      self.mem(args[2], mode2,
-          val=self.mem(args[0], mode0) + self.mem(args[1], mode1))
-    elif instr == 2:
-      self.mem(args[2], mode2,
-          val=self.mem(args[0], mode0) * self.mem(args[1], mode1))
-    elif instr == 3:
-      recv=self.io_in()
-      self.mem(args[0], mode0, val=recv)
-      return IntCodeStatus("io", recv)
-    elif instr == 4:
-      send = self.mem(args[0], mode0)
-      self.io_out(send)
-      return IntCodeStatus("io", send)
-    elif instr == 5:
-      if self.mem(args[0], mode0) != 0:
-        # we increment program counter later.
-        self.program_counter = self.mem(args[1], mode1)
-    elif instr == 6:
-      if self.mem(args[0], mode0) == 0:
-        # we increment program counter later.
-        self.program_counter = self.mem(args[1], mode1)
-    elif instr == 7:
-      self.mem(args[2], mode2,
-          val=int(self.mem(args[0], mode0) < self.mem(args[1], mode1)))
-    elif instr == 8:
-      self.mem(args[2], mode2,
-          val=int(self.mem(args[0], mode0) == self.mem(args[1], mode1)))
-    elif instr == 9:
-      self.relative_offset += self.mem(args[0], mode0)
-    elif instr == 99:
-      # Reset the PC, we won't ever do anything again.
-      # This is _just_ in case something funny happens.
-      self.program_counter = pc
-      return IntCodeStatus("exit", 0)
-    else:
-      raise Exception("invalid instruction: %s at index: " % (str(instr), self.program_counter))
-    return IntCodeStatus("running", pc)
-
-  def run(self):
-    out = None
-    while True:
-      if out.status == "exit" or self.steps == self.cycle_counter:
-        break
-      out = self.exec()
-
-  def mem(self, arg, mode, *, val=None):
-    if mode not in [0, 1, 2]:
-      raise Exception("bad mode: %s" % mode)
-    if val is not None:
-      # data write
-      if mode == 0:
-        self.memory[arg] = val
-      elif mode == 1:
-        raise Exception("illegal mode for write: %s" % mode)
-      elif mode == 2:
-        self.memory[arg + self.relative_offset] = val
-    else:
-      if mode == 0:
-        return self.memory[arg]
-      elif mode == 1:
-        return arg
-      elif mode == 2:
-        return self.memory[arg + self.relative_offset]
 
-
-def aa(size):
-  "Creates an array of arrays for the given size"
-  a = []
-  for i in range(size):
-    a.append([])
-  return a
+def print_trace(sender, addr, x, y):
+  print("send:", sender, "->", addr, "==", x, y)
 
 
 class Router(object):
-  def __init__(self, size, handler=None):
-    self.packets = aa(size)
-    self.outgoing= aa(size)
+  def __init__(self, size, handler=None, wake=None, trace=None):
+    self.packets = [ collections.deque() for i in range(size) ]
     self.size = size
     self.handler = handler
+    # Called with the address of every machine that gets a packet.
+    self.wake = wake
+    # Called with (sender, addr, x, y) for every packet, if set.
+    self.trace = trace
     self.nat = (0, 0)
+    self.first_nat = None
+    # Packets routed, and the time spent routing them.
+    self.packet_count = 0
+    self.busy = 0.0
 
   def raw_send(self, addr, *args):
     self.packets[addr].extend(args)
+    if self.wake:
+      self.wake(addr)
 
   def network_idle(self):
-    print("idle!")
-    print("send:", 255, "->", 0, "==", *self.nat)
+    if self.trace:
+      self.trace(255, 0, *self.nat)
     self.raw_send(0, *self.nat)
 
-  def do_send(self, sender, v):
-    out = self.outgoing[sender]
-    out.append(v)
-    if len(out) >= 3:
-      addr, x, y, *rest = out
-      print("send:", sender, "->", addr, "==", x, y)
-      if addr == 255:
-        self.nat = (x, y)
-      elif addr >= self.size:
-        # Bad addr.
-        self.handler(addr, x, y)
-      else:
-        # Send x,y to addr
-        self.raw_send(addr, x, y)
-        # Replace the outgoing list with whatever was left.
-        self.outgoing[sender] = rest
+  def send(self, sender, addr, x, y):
+    start = time.perf_counter()
+    self.packet_count += 1
+    if self.trace:
+      self.trace(sender, addr, x, y)
+    if addr == 255:
+      self.nat = (x, y)
+      if self.first_nat is None:
+        self.first_nat = self.nat
+    elif addr >= self.size:
+      # Bad addr.
+      self.handler(addr, x, y)
+    else:
+      # Send x,y to addr
+      self.raw_send(addr, x, y)
+    self.busy += time.perf_counter() - start
 
   def do_recv(self, addr):
-    if self.pending(addr):
-      return self.packets[addr].pop(0)
+    packets = self.packets[addr]
+    if packets:
+      return packets.popleft()
     return -1
 
-  def any_pending(self):
-    result = False
-    for i in range(self.size):
-      result = result or self.pending(i)
-    return result
-
   def pending(self, addr):
     return len(self.packets[addr]) > 0
 
+  def throughput(self):
+    """Packets routed per second the router spent routing them."""
+    if not self.busy:
+      return 0.0
+    return self.packet_count / self.busy
+
   def bind_send(self, addr):
-    # Create a function to bind sending from a particular address
+    # Create a function to bind sending from a particular address, the
+    # VM writes one value at a time so this puts frames back together.
+    frame = []
     def send_func(val):
-      self.do_send(addr, val)
+      frame.append(val)
+      if len(frame) == 3:
+        self.send(addr, *frame)
+        frame.clear()
     return send_func
 
   def bind_recv(self, addr):
@@ -214,59 +91,95 @@ class Router(object):
 
 
 class Network(object):
-  def __init__(self, size, program):
-    self.read_count = { i: 0 for i in range(size) }
+  """Runs every machine until it blocks on input, instead of in lock step.
+
+  A machine that reads with nothing queued gets -1 once (the programs poll),
+  if it asks again before anything arrives it's parked until a packet shows
+  up for it. When there's no machine left to run the network is idle.
+  """
+  def __init__(self, size, program, trace=None, profile=None):
     self.size = size
     self.executing = True
-    self.router = Router(size, self.error_handler)
+    self.router = Router(size, self.error_handler, self.wake, trace)
     self.machines = []
-
-    # Initialize the initial packets
-    for i in range(size):
-      self.router.raw_send(i, i)
+    # Machines that can make progress, in the order they get to run.
+    self.ready = collections.deque()
+    self.parked = [False] * size
+    # Whether the machine was handed -1 since it last did any I/O.
+    self.polled = [False] * size
+    self.last_nat = None
 
     # Initialize the machines.
     for i in range(size):
-      m = IntCode(0, self.router.bind_recv(i), self.router.bind_send(i))
+      m = IntCode(0, self.bind_recv(i), self.bind_send(i))
       m.memory = list(program) # SUPER IMPORTANT TO CREATE A COPY
+      m.profile = profile
       self.machines.append(m)
+      self.ready.append(i)
+
+    # Initialize the initial packets
+    for i in range(size):
+      self.router.raw_send(i, i)
 
   def error_handler(self, addr, x, y):
     print("error:", addr, x, y)
     self.executing = False
 
-  def all_reading(self, threshold=5):
-    result = True
-    for r in self.read_count.values():
-      result = result and r > threshold
-    return result
-
-  def exec(self):
-    # Execute a single instruction across all the IntCode computers.
-    for i in range(self.size):
-      m = self.machines[i]
-      (status, value) = m.exec()
-      if status == "io":
-        if value == -1:
-          self.read_count[i] += 1
-        else:
-          self.read_count[i] = 0
+  def wake(self, addr):
+    if self.parked[addr]:
+      self.parked[addr] = False
+      self.ready.append(addr)
+
+  def bind_recv(self, addr):
+    router = self.router
+    recv = router.bind_recv(addr)
+    polled = self.polled
+    def recv_func():
+      if router.pending(addr):
+        polled[addr] = False
+        return recv()
+      if polled[addr]:
+        raise WaitForInput()
+      polled[addr] = True
+      return -1
+    return recv_func
+
+  def bind_send(self, addr):
+    send = self.router.bind_send(addr)
+    polled = self.polled
+    def send_func(val):
+      polled[addr] = False
+      send(val)
+    return send_func
 
   def run(self):
-    i = 0
+    machines = self.machines
+    ready = self.ready
     while self.executing:
-      i += 1
-      if i % 10000 == 0:
-        print('.', end='', flush=True)
-      self.exec()
+      while ready and self.executing:
+        i = ready.popleft()
+        status, _ = machines[i].run()
+        if status == "wait":
+          self.parked[i] = True
+
+      if not self.executing:
+        break
 
-      if self.all_reading(15) and not self.router.any_pending():
-        self.router.network_idle()
+      # Nobody can make progress, the NAT takes over.
+      nat = self.router.nat
+      if self.last_nat is not None and self.last_nat[1] == nat[1]:
+        break
+      self.last_nat = nat
+      self.router.network_idle()
 
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser()
   parser.add_argument('program', type=IntCodeProgramType(), nargs='?', default=[99,0,0,0])
+  parser.add_argument('--trace', action='store_true', help='Print every packet sent.')
+  parser.add_argument('--stats', action='store_true', help='Print router throughput.')
+  parser.add_argument('--profile', type=argparse.FileType('w'),
+      help='Write folded stacks here, and a hotspot report to stderr.')
 
   args = parser.parse_args(sys.argv[1:])
 
@@ -274,8 +187,22 @@ if __name__ == "__main__":
   program = args.program
   program.extend([0] * (4096 - len(program)))
   #print(args.program)
-  n = Network(size=50, program=program)
+  profile = IntCodeProfile() if args.profile else None
+  n = Network(size=50, program=program,
+      trace=print_trace if args.trace else None, profile=profile)
 
+  start = time.perf_counter()
   n.run()
-  #for i in range(100):
-  #  n.exec()
+  elapsed = time.perf_counter() - start
+
+  if n.router.first_nat:
+    print("first nat:", *n.router.first_nat)
+  if n.last_nat:
+    print("repeated:", *n.last_nat)
+  if args.stats:
+    r = n.router
+    print("packets: %d, %.0f packets/s routed, router %.3fs of %.3fs" % (
+        r.packet_count, r.throughput(), r.busy, elapsed))
+  if profile:
+    profile.write_folded(args.profile, "day-23")
+    print(profile.report(), file=sys.stderr)
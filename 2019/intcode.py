@@ -0,0 +1,728 @@
+#!/usr/bin/env python3
+
+# Shared IntCode engine for the 2019 days.
+#
+# Instead of decoding every instruction on every cycle, each address is
+# decoded once into a small closure that is specialized for its opcode and
+# parameter modes (immediate operands are baked in, positional operands
+# become plain list indexing). The closures are cached per address and any
+# write that lands on a cell that was decoded from throws away the cached
+# instructions that may cover it, so self-modifying programs still work.
+
+import collections
+import sys
+
+
+IntCodeStatus = collections.namedtuple("IntCodeStatus", ["status", "value"])
+# Skips the generated __new__, exec() builds one of these every cycle.
+_status = tuple.__new__
+
+
+class IntCodeProgramType(object):
+  def __repr__(self):
+    return 'IntCodeProgramType'
+
+  def __call__(self, string):
+    f = None
+    if string == "-":
+      f = sys.stdin
+    else:
+      f = open(string, mode='r')
+
+    # We plan to consume all of the contents.
+    try:
+      contents = []
+      for line in f:
+        line = line.strip()
+        if not line or line.startswith("#"):
+          continue
+        contents.extend(line.split(','))
+      return [ int(i) for i in contents ]
+    finally:
+      f.close()
+
+
+def load(f):
+  contents = []
+  for line in f:
+    contents.extend(line.split(','))
+  return [ int(i) for i in contents ]
+
+
+# Number of arguments each instruction takes.
+ARGC = {
+  1: 3, 2: 3, 3: 1, 4: 1, 5: 2, 6: 2, 7: 3, 8: 3, 9: 1, 99: 0,
+}
+
+
+def decode_modes(instr):
+  return ((instr // 10000) % 10,
+          (instr // 1000) % 10,
+          (instr // 100) % 10,
+          (instr % 100))
+
+
+def read_operand(mode, arg, base="vm.relative_offset"):
+  """Python expression that reads argument `arg` (source text) in `mode`."""
+  if mode == 0:
+    return "mem[%s]" % arg
+  elif mode == 1:
+    return arg
+  elif mode == 2:
+    return "mem[%s + %s]" % (arg, base)
+  raise Exception("bad mode: %s" % mode)
+
+
+def write_operand(mode, arg, base="vm.relative_offset"):
+  """Python expression for the address that argument `arg` writes to."""
+  if mode == 0:
+    return arg
+  elif mode == 2:
+    return "%s + %s" % (arg, base)
+  raise Exception("illegal mode for write: %s" % mode)
+
+
+def operands(modes, args, base="vm.relative_offset"):
+  """Format arguments for the instruction source below.
+
+  {rN} is the N-th argument read, {wN} the address the N-th argument writes
+  to. Only the reads are rendered for immediate arguments, writing to them is
+  illegal but reading them is fine.
+  """
+  fmt = {}
+  for i, (mode, arg) in enumerate(zip(modes, args)):
+    fmt["r%d" % i] = read_operand(mode, arg, base)
+    if mode != 1:
+      fmt["w%d" % i] = write_operand(mode, arg, base)
+  return fmt
+
+
+class Halt(Exception):
+  """Raised by the halt instruction, keeps the exit check out of the loop."""
+  pass
+
+
+class WaitForInput(Exception):
+  """Raised by io_in when there's nothing to read yet.
+
+  The machine stops on the input instruction without executing it, running
+  the machine again retries the read.
+  """
+  pass
+
+
+# Value computed by the instructions that only do math, it's always written
+# to their third argument.
+ARITHMETIC = {
+  1: "{r0} + {r1}",
+  2: "{r0} * {r1}",
+  7: "1 if {r0} < {r1} else 0",
+  8: "1 if {r0} == {r1} else 0",
+}
+
+# Address of the next instruction after a conditional jump.
+JUMPS = {
+  5: "{r1} if {r0} else {nxt}",
+  6: "{nxt} if {r0} else {r1}",
+}
+
+# Body of every instruction. Every instruction returns the address of the
+# next one, `nxt` being the one straight after it.
+INSTR_SOURCE = {
+  3: ["v = vm.io_in()",
+      "t = {w0}",
+      "mem[t] = v",
+      "if covered[t]: vm._invalidate(t)",
+      "vm.last_io = v",
+      "return nxt"],
+  4: ["v = {r0}",
+      "vm.last_io = v",
+      "vm.io_out(v)",
+      "return nxt"],
+  9: ["vm.relative_offset += {r0}",
+      "return nxt"],
+  99: ["raise Halt()"],
+}
+for instr, expr in ARITHMETIC.items():
+  INSTR_SOURCE[instr] = [
+      "t = {w2}",
+      "mem[t] = " + expr,
+      "if covered[t]: vm._invalidate(t)",
+      "return nxt"]
+for instr, expr in JUMPS.items():
+  INSTR_SOURCE[instr] = ["return " + expr]
+
+
+def instr_lines(instr, modes, args):
+  """Source lines for `instr`, with `args` being the argument source text."""
+  fmt = operands(modes, args)
+  try:
+    return [ line.format(nxt="nxt", **fmt) for line in INSTR_SOURCE[instr] ]
+  except KeyError:
+    raise Exception("illegal mode for write: %s" % str(modes))
+
+
+__FACTORIES = {}
+
+def handler_factory(instr, modes):
+  """Returns a function that builds a handler for (instr, modes).
+
+  The source for each shape is only generated and compiled once, each
+  decoded address then just closes over its own arguments.
+  """
+  key = (instr, modes)
+  factory = __FACTORIES.get(key)
+  if factory is not None:
+    return factory
+
+  names = ["a0", "a1", "a2"][:len(modes)]
+  body = instr_lines(instr, modes, names)
+  src = "\n".join(
+      ["def factory(%s):" % ", ".join(["vm", "mem", "covered", "nxt"] + names),
+       "  def op():"] +
+      [ "    " + line for line in body ] +
+      ["  return op"])
+  scope = {"Halt": Halt}
+  exec(compile(src, "<intcode %s %s>" % key, "exec"), scope)
+  factory = scope["factory"]
+  __FACTORIES[key] = factory
+  return factory
+
+
+# Longest run of instructions compiled into a single block.
+MAX_BLOCK = 64
+
+def block_lines(mem, start, volatile):
+  """Source for the basic block starting at `start`.
+
+  A block is a straight line run of math & relative base instructions,
+  optionally ended by a conditional jump. I/O and halts are left to the
+  interpreter. Relative base updates are kept in a local until the block
+  exits. Every exit adds the instructions executed past the first one to
+  vm._block_cycles, since the run loop only counts one per dispatch.
+
+  A write that lands on the rest of the block makes it bail out to the
+  interpreter straight after it, as that part is now stale. Instructions
+  built from `volatile` cells (ones that have been written to before) are
+  never put in a block, they're left to the interpreter as well.
+
+  Returns (lines, end, count), with `end` the first address past the block.
+  """
+  lines = []
+  pc = start
+  count = 0
+  rebased = False
+  target = None
+
+  def leave(target):
+    out = []
+    if rebased:
+      out.append("vm.relative_offset = ro")
+    if count > 1:
+      out.append("vm._block_cycles += %d" % (count - 1))
+    out.append("return %s" % target)
+    return out
+
+  while count < MAX_BLOCK and pc < len(mem):
+    mode2, mode1, mode0, instr = decode_modes(mem[pc])
+    if instr not in ARITHMETIC and instr not in JUMPS and instr != 9:
+      break
+    argc = ARGC[instr]
+    args = [ str(a) for a in mem[pc + 1:pc + 1 + argc] ]
+    if len(args) < argc or any(volatile[pc:pc + argc + 1]):
+      break
+    try:
+      fmt = operands((mode0, mode1, mode2)[:argc], args, base="ro")
+    except Exception:
+      # Bad modes, let the interpreter complain about them.
+      break
+    if instr in ARITHMETIC and "w2" not in fmt:
+      break
+    nxt = pc + argc + 1
+    count += 1
+
+    if instr in JUMPS:
+      target = JUMPS[instr].format(nxt=nxt, **fmt)
+      pc = nxt
+      break
+    elif instr == 9:
+      lines.append("ro += %s" % fmt["r0"])
+      rebased = True
+    else:
+      lines.append("t = %s" % fmt["w2"])
+      lines.append("mem[t] = " + ARITHMETIC[instr].format(**fmt))
+      lines.append("if covered[t]:")
+      lines.append("  vm._invalidate(t)")
+      # The end of the block isn't known yet, it's filled in below.
+      lines.append("  if %d <= t < {end}:" % nxt)
+      lines.extend([ "    " + l for l in leave(nxt) ])
+    pc = nxt
+
+  lines.extend(leave(target or pc))
+  return ([ l.replace("{end}", str(pc)) for l in lines ], pc, count)
+
+
+__BLOCKS = {}
+
+def block_factory(lines):
+  """Returns a function that builds a block from its source lines.
+
+  Blocks only contain constants, so machines running the same program share
+  the compiled code.
+  """
+  key = "\n".join(lines)
+  factory = __BLOCKS.get(key)
+  if factory is not None:
+    return factory
+
+  src = "\n".join(
+      ["def factory(vm, mem, covered):",
+       "  def block():",
+       "    ro = vm.relative_offset"] +
+      [ "    " + line for line in lines ] +
+      ["  return block"])
+  scope = {}
+  exec(compile(src, "<intcode block>", "exec"), scope)
+  factory = scope["factory"]
+  __BLOCKS[key] = factory
+  return factory
+
+
+_NONES = [None] * 4
+
+def default_in():
+  return int(input(""))
+
+
+IntCodeSnapshot = collections.namedtuple("IntCodeSnapshot",
+    ["pages", "program_counter", "relative_offset", "cycle_counter", "queues"])
+
+# Cells per page of a snapshot.
+PAGE = 128
+
+
+class IOQueues(object):
+  """io_in & io_out backed by queues, which makes them part of snapshots.
+
+  Reading with nothing queued stops the machine with WaitForInput.
+  """
+  def __init__(self, inputs=(), outputs=()):
+    self.inputs = collections.deque(inputs)
+    self.outputs = list(outputs)
+
+  def read(self):
+    if not self.inputs:
+      raise WaitForInput()
+    return self.inputs.popleft()
+
+  def write(self, val):
+    self.outputs.append(val)
+
+  def copy(self):
+    return IOQueues(self.inputs, self.outputs)
+
+
+OPNAMES = {
+  1: "add", 2: "mul", 3: "in", 4: "out", 5: "jnz", 6: "jz", 7: "lt", 8: "eq",
+  9: "arb", 99: "halt",
+}
+
+
+class IntCodeProfile(object):
+  """Instruction counts collected by IntCode.run() while `profile` is set.
+
+  Counts are kept per executed (entry, pc, opcode), where entry is the
+  address execution last jumped to. That's the closest thing IntCode has to
+  a function, and it's what the folded stacks are grouped by. One profile
+  can be shared by any number of machines.
+  """
+  def __init__(self):
+    self.counts = collections.Counter()
+    # pc -> number of times an input instruction had nothing to read.
+    self.blocked = collections.Counter()
+
+  def total(self):
+    return sum(self.counts.values())
+
+  def by_address(self):
+    out = collections.Counter()
+    for (_, pc, _), count in self.counts.items():
+      out[pc] += count
+    return out
+
+  def by_opcode(self):
+    out = collections.Counter()
+    for (_, _, instr), count in self.counts.items():
+      out[instr] += count
+    return out
+
+  def by_entry(self):
+    out = collections.Counter()
+    for (entry, _, _), count in self.counts.items():
+      out[entry] += count
+    return out
+
+  def report(self, top=20):
+    total = self.total() or 1
+    opcodes = self.by_opcode()
+    lines = ["%d instructions, %d io, %d blocked on input" % (
+        self.total(), opcodes[3] + opcodes[4], sum(self.blocked.values()))]
+    lines.append("opcodes:")
+    for instr, count in opcodes.most_common():
+      lines.append("  %-5s %10d %5.1f%%" % (
+          OPNAMES.get(instr, instr), count, 100 * count / total))
+    lines.append("entry points:")
+    for entry, count in self.by_entry().most_common(top):
+      lines.append("  %5d %10d %5.1f%%" % (entry, count, 100 * count / total))
+    lines.append("addresses:")
+    for pc, count in self.by_address().most_common(top):
+      lines.append("  %5d %10d %5.1f%%" % (pc, count, 100 * count / total))
+    if self.blocked:
+      lines.append("blocked:")
+      for pc, count in self.blocked.most_common(top):
+        lines.append("  %5d %10d" % (pc, count))
+    return "\n".join(lines)
+
+  def write_folded(self, f, name="intcode"):
+    """Writes folded stacks, the input format of flamegraph.pl."""
+    for (entry, pc, instr), count in sorted(self.counts.items()):
+      f.write("%s;@%d;%s@%d %d\n" % (
+          name, entry, OPNAMES.get(instr, instr), pc, count))
+
+
+class IntCode(object):
+
+  def __init__(self, size, io_in=default_in, io_out=print):
+    self.memory = [0] * size
+    self.relative_offset = 0
+    self.program_counter = 0
+    self.cycle_counter = 0
+    self.steps = -1
+    self.io_in = io_in
+    self.io_out = io_out
+    # Value read or written by the last I/O instruction.
+    self.last_io = None
+    # Compile basic blocks to python in run(), only worth it for programs
+    # that run for a long time.
+    self.jit = False
+    self._block_cycles = 0
+    # Set by use_queues().
+    self.queues = None
+    # Set to an IntCodeProfile to count what run() executes, that runs
+    # without the jit.
+    self.profile = None
+    self._entry = 0
+
+  @property
+  def memory(self):
+    return self._memory
+
+  @memory.setter
+  def memory(self, memory):
+    # Anything decoded belonged to the old memory.
+    self._memory = memory
+    self._decoded = [None] * len(memory)
+    # Writes to these cells call _invalidate(). That's every cell something
+    # was decoded from, and while snapshots are tracked, every page not yet
+    # written to since the last one.
+    self._covered = bytearray(len(memory))
+    # Cells something was decoded from.
+    self._code = bytearray(len(memory))
+    self._blocks = [None] * len(memory)
+    self._volatile = bytearray(len(memory))
+    # (pc, *instruction) -> decoded instruction
+    self._seen = {}
+    # address -> start of every compiled block built from it.
+    self._block_cells = collections.defaultdict(list)
+    # Pages of the last snapshot taken or restored, and which of them have
+    # been written to since.
+    self._pages = None
+    self._dirty = None
+
+  def use_queues(self, queues=None):
+    """Switch I/O over to queues, returns them."""
+    self.queues = queues if queues is not None else IOQueues()
+    self.io_in = self.queues.read
+    self.io_out = self.queues.write
+    return self.queues
+
+  def snapshot(self):
+    """Saves the machine state, restore() or fork() pick it back up.
+
+    Memory is saved in pages, copy on write: pages that haven't been written
+    to since the last snapshot taken or restored are shared with it. Pages
+    are never written to, so any number of machines can be restored from a
+    snapshot. I/O queues are included if use_queues() is in effect, I/O
+    callbacks are not.
+    """
+    mem = self._memory
+    if self._pages is None:
+      pages = [ mem[start:start + PAGE] for start in range(0, len(mem), PAGE) ]
+    else:
+      pages = list(self._pages)
+      i = self._dirty.find(1)
+      while i != -1:
+        page = mem[i * PAGE:(i + 1) * PAGE]
+        if page != pages[i]:
+          pages[i] = page
+        i = self._dirty.find(1, i + 1)
+    self._protect(tuple(pages))
+    queues = self.queues.copy() if self.queues is not None else None
+    return IntCodeSnapshot(self._pages, self.program_counter,
+        self.relative_offset, self.cycle_counter, queues)
+
+  def restore(self, snapshot):
+    pages = snapshot.pages
+    mem = self._memory
+    if len(mem) == sum(map(len, pages)):
+      # Same memory list, only the pages that differ get copied. Decoded
+      # instructions stay, apart from the ones built from a changed cell.
+      base = self._pages
+      dirty = self._dirty
+      if base is None:
+        changed = range(len(pages))
+      else:
+        changed = [ i for i, page in enumerate(pages) if dirty[i] or base[i] is not page ]
+      code = self._code
+      for i in changed:
+        page = pages[i]
+        start = i * PAGE
+        end = start + len(page)
+        if base is not None and not dirty[i]:
+          # Memory still holds base[i] here.
+          if base[i] == page:
+            continue
+        elif mem[start:end] == page:
+          continue
+        if code.find(1, start, end) != -1:
+          for addr, value in enumerate(page, start):
+            if code[addr] and mem[addr] != value:
+              self._invalidate(addr)
+        mem[start:end] = page
+    else:
+      self.memory = [ cell for page in pages for cell in page ]
+    self._protect(pages)
+    self.program_counter = snapshot.program_counter
+    self.relative_offset = snapshot.relative_offset
+    self.cycle_counter = snapshot.cycle_counter
+    if snapshot.queues is not None:
+      self.use_queues(snapshot.queues.copy())
+
+  def _protect(self, pages):
+    # Memory matches `pages`. Until a page gets written to every write to it
+    # goes through _invalidate(), which marks it dirty.
+    self._pages = pages
+    self._dirty = bytearray(len(pages))
+    self._covered[:] = b"\x01" * len(self._covered)
+
+  def fork(self, snapshot=None):
+    """New machine that carries on from `snapshot`, or from right now."""
+    if snapshot is None:
+      snapshot = self.snapshot()
+    other = IntCode(0, self.io_in, self.io_out)
+    other.steps = self.steps
+    other.jit = self.jit
+    other.restore(snapshot)
+    return other
+
+  def fingerprint(self):
+    """Hash of everything that decides what the machine does next."""
+    queues = None
+    if self.queues is not None:
+      queues = (tuple(self.queues.inputs), tuple(self.queues.outputs))
+    return hash((self.program_counter, self.relative_offset,
+        tuple(self._memory), queues))
+
+  def _decode(self, pc):
+    mem = self._memory
+    pinstr = mem[pc]
+    mode2, mode1, mode0, instr = decode_modes(pinstr)
+    argc = ARGC.get(instr)
+    if argc is None:
+      raise Exception("invalid instruction: %s at index: %s" % (str(instr), pc))
+
+    end = pc + argc + 1
+    if end > len(mem):
+      raise IndexError("instruction: %s at index: %s runs past the end of memory" % (str(instr), pc))
+    # Programs that patch their own instructions tend to cycle through the
+    # same few versions of them.
+    key = (pc, *mem[pc:end])
+    op = self._seen.get(key)
+    if op is None:
+      args = mem[pc + 1:end]
+      factory = handler_factory(instr, (mode0, mode1, mode2)[:argc])
+      op = factory(self, mem, self._covered, end, *args)
+      self._seen[key] = op
+
+    self._covered[pc:end] = b"\x01" * (end - pc)
+    self._code[pc:end] = b"\x01" * (end - pc)
+    self._decoded[pc] = op
+    return op
+
+  def _invalidate(self, addr):
+    if self._dirty is not None:
+      page = addr // PAGE
+      if not self._dirty[page]:
+        # First write to the page since the last snapshot, stop watching
+        # the rest of it.
+        self._dirty[page] = 1
+        start = page * PAGE
+        self._covered[start:start + PAGE] = self._code[start:start + PAGE]
+      if not self._code[addr]:
+        return
+    # Drop every decoded instruction that could have been built from addr,
+    # they get decoded again the next time they're executed.
+    start = addr - 3 if addr > 3 else 0
+    self._decoded[start:addr + 1] = _NONES[start - addr - 1:]
+    blocks = self._blocks
+    blocks[start:addr + 1] = _NONES[start - addr - 1:]
+    if addr in self._block_cells:
+      for pc in self._block_cells.pop(addr):
+        blocks[pc] = None
+    self._volatile[addr] = 1
+
+  def _build_block(self, pc):
+    instr = self._memory[pc] % 100
+    if (instr not in ARITHMETIC and instr not in JUMPS and instr != 9
+        or any(self._volatile[pc:pc + 4])):
+      # Can't start a block here, skip building the source. These get
+      # rebuilt every time a volatile cell is written, so it's worth it.
+      count = 0
+    else:
+      lines, end, count = block_lines(self._memory, pc, self._volatile)
+    if count < 2:
+      # Nothing to gain, use the plain instruction.
+      op = self._decoded[pc] or self._decode(pc)
+    else:
+      op = block_factory(lines)(self, self._memory, self._covered)
+      self._covered[pc:end] = b"\x01" * (end - pc)
+      self._code[pc:end] = b"\x01" * (end - pc)
+      for addr in range(pc, end):
+        self._block_cells[addr].append(pc)
+    self._blocks[pc] = op
+    return op
+
+  def exec(self):
+    pc = self.program_counter
+    op = self._decoded[pc] or self._decode(pc)
+    self.cycle_counter += 1
+    self.last_io = None
+    try:
+      self.program_counter = op()
+    except Halt:
+      # The PC stays on the halt, we won't ever do anything again.
+      return _status(IntCodeStatus, ("exit", 0))
+    except WaitForInput:
+      self.cycle_counter -= 1
+      return _status(IntCodeStatus, ("wait", pc))
+    if self.last_io is not None:
+      return _status(IntCodeStatus, ("io", self.last_io))
+    return _status(IntCodeStatus, ("running", pc))
+
+  def run(self):
+    """Same as calling exec() until it stops, without the per cycle overhead.
+
+    Returns the status it stopped with: "exit", "wait" when io_in has nothing
+    to read, or "running" when it ran out of steps.
+    """
+    if self.profile is not None:
+      return self._run_profiled()
+    if self.jit and (self.steps is None or self.steps < self.cycle_counter):
+      # Blocks can't stop part way through, so there's no stepping them.
+      return self._run_blocks()
+    decoded = self._decoded
+    decode = self._decode
+    pc = self.program_counter
+    count = self.cycle_counter
+    steps = self.steps
+    try:
+      if steps is None or steps < count:
+        while True:
+          count += 1
+          pc = (decoded[pc] or decode(pc))()
+      else:
+        while count != steps:
+          count += 1
+          pc = (decoded[pc] or decode(pc))()
+    except Halt:
+      return _status(IntCodeStatus, ("exit", 0))
+    except WaitForInput:
+      count -= 1
+      return _status(IntCodeStatus, ("wait", pc))
+    finally:
+      self.program_counter = pc
+      self.cycle_counter = count
+    return _status(IntCodeStatus, ("running", pc))
+
+  def _run_profiled(self):
+    decoded = self._decoded
+    decode = self._decode
+    mem = self._memory
+    counts = self.profile.counts
+    pc = self.program_counter
+    count = self.cycle_counter
+    steps = self.steps
+    entry = self._entry
+    try:
+      while steps is None or count != steps:
+        instr = mem[pc] % 100
+        nxt = (decoded[pc] or decode(pc))()
+        count += 1
+        counts[entry, pc, instr] += 1
+        if nxt != pc + ARGC[instr] + 1:
+          entry = nxt
+        pc = nxt
+    except Halt:
+      count += 1
+      counts[entry, pc, 99] += 1
+      return _status(IntCodeStatus, ("exit", 0))
+    except WaitForInput:
+      self.profile.blocked[pc] += 1
+      return _status(IntCodeStatus, ("wait", pc))
+    finally:
+      self.program_counter = pc
+      self.cycle_counter = count
+      self._entry = entry
+    return _status(IntCodeStatus, ("running", pc))
+
+  def _run_blocks(self):
+    blocks = self._blocks
+    build = self._build_block
+    pc = self.program_counter
+    count = self.cycle_counter
+    self._block_cycles = 0
+    try:
+      while True:
+        count += 1
+        pc = (blocks[pc] or build(pc))()
+    except Halt:
+      return _status(IntCodeStatus, ("exit", 0))
+    except WaitForInput:
+      count -= 1
+      return _status(IntCodeStatus, ("wait", pc))
+    finally:
+      self.program_counter = pc
+      self.cycle_counter = count + self._block_cycles
+      self._block_cycles = 0
+
+  def mem(self, arg, mode, *, val=None):
+    if mode not in [0, 1, 2]:
+      raise Exception("bad mode: %s" % mode)
+    if val is not None:
+      # data write
+      if mode == 0:
+        addr = arg
+      elif mode == 1:
+        raise Exception("illegal mode for write: %s" % mode)
+      elif mode == 2:
+        addr = arg + self.relative_offset
+      self._memory[addr] = val
+      if self._covered[addr]:
+        self._invalidate(addr)
+    else:
+      if mode == 0:
+        return self._memory[arg]
+      elif mode == 1:
+        return arg
+      elif mode == 2:
+        return self._memory[arg + self.relative_offset]
@@ -2,6 +2,7 @@
 
 import argparse
 import collections
+import random
 import re
 import sys
 import typing
@@ -16,86 +17,137 @@ def load_file(filename):
   return contents
 
 
-class Position(typing.NamedTuple):
-  width: int
-  height: int
+def repeat_rows(row, width, height):
+  """Bitset with `row` as every one of the rows."""
+  out, rows = row, 1
+  while rows * 2 <= height:
+    out |= out << (rows * width)
+    rows *= 2
+  if rows < height:
+    out |= repeat_rows(row, width, height - rows) << (rows * width)
+  return out
 
-  def __add__(self, other):
-    assert type(other) == Position
-    return Position(self.width + other.width, self.height + other.height)
+
+def shift(bits, offset):
+  """Moves whatever is `offset` positions ahead into each position."""
+  return bits >> offset if offset >= 0 else bits << -offset
+
+
+def at_least(planes, count, mask):
+  # planes[i] holds bit i of every position's count, true where it's >= count.
+  result = 0
+  equal = mask
+  for i in reversed(range(len(planes))):
+    if (count >> i) & 1:
+      equal &= planes[i]
+    else:
+      result |= equal & planes[i]
+      equal &= ~planes[i]
+  return result | equal
 
 
 class Seating:
-  def __init__(self, width, height, seats):
+  """Seats and who's sitting in them as bitsets, position (x, y) is bit y * width + x.
+
+  Each generation is a handful of whole-grid shifts and masks, which python
+  does on all the bits at once.
+  """
+  def __init__(self, width, height, seats, occupied):
     self.width = width
     self.height = height
     self.seats = seats
+    self.occupied = occupied
     self.changed = True # makes iterations easier
 
   @staticmethod
-  def __dict():
-    # by default return 'void' so that we can catch edges
-    # this helps looping code that works on 'while position == .'
-    return collections.defaultdict(lambda: ' ')
+  def __bits(lines, table):
+    # int() reads the most significant digit first, position 0 goes last.
+    return int("".join(lines).translate(table)[::-1] or "0", 2)
 
   @staticmethod
   def from_lines(lines):
-    # Convert to internal dict format
     height = len(lines)
     width = len(lines[0])
-
-    # default to floor
-    seats = Seating.__dict()
-
-    for h in range(height):
-      line = lines[h]
+    for line in lines:
       assert len(line) == width
 
-      for w in range(width):
-        seats[Position(w, h)] = line[w]
-
-    return Seating(width, height, seats)
+    seats = Seating.__bits(lines, str.maketrans("L#.", "110"))
+    occupied = Seating.__bits(lines, str.maketrans("L#.", "010"))
+    return Seating(width, height, seats, occupied)
 
   def __repr__(self):
-    out = []
-    for h in range(self.height):
-      line = ''
-      for w in range(self.width):
-        line += self.seats[(w, h)]
-      out.append(line)
-    return '\n'.join(out)
+    n = self.width * self.height
+    seats = format(self.seats, "0{}b".format(n))[::-1]
+    occupied = format(self.occupied, "0{}b".format(n))[::-1]
+    cells = [ '#' if o == '1' else 'L' if s == '1' else '.' for s, o in zip(seats, occupied) ]
+    return '\n'.join([ ''.join(cells[i:i + self.width]) for i in range(0, n, self.width) ])
+
+  def neighbors(self, sight=None):
+    """Which seat each seat sees in every direction, stopping after `sight` cells.
+
+    Returns, per direction, (offset, mask) pairs: the seats in mask see the
+    seat `offset` positions ahead of them. Floor gets looked past, seats
+    that see nothing in a direction aren't in any of its masks.
+    """
+    w, h = self.width, self.height
+    everything = (1 << (w * h)) - 1
+    row = (1 << w) - 1
+    first_col = repeat_rows(1, w, h)
+    last_col = repeat_rows(1 << (w - 1), w, h)
+    last_row = row << ((h - 1) * w)
+
+    index = []
+    for dx, dy in directions():
+      # Positions with an in bounds neighbor in this direction.
+      step_ok = everything
+      if dx < 0:
+        step_ok &= ~first_col
+      elif dx > 0:
+        step_ok &= ~last_col
+      if dy < 0:
+        step_ok &= ~row
+      elif dy > 0:
+        step_ok &= ~last_row
+      step = dy * w + dx
+
+      pairs = []
+      looking = self.seats
+      valid = step_ok
+      distance = 1
+      while looking and (sight is None or distance <= sight):
+        seen = looking & valid & shift(self.seats, distance * step)
+        if seen:
+          pairs.append((distance * step, seen))
+        # Anything still in bounds & not a seat is floor, keep looking.
+        looking &= valid & ~seen
+        valid &= shift(step_ok, distance * step)
+        distance += 1
+      index.append(pairs)
+    return index
 
   # Sort of like Conway's game of life.
-  def step(self, adj_func, leave_seat_threshold):
-    n = Seating.__dict()
+  def step(self, neighbors, leave_seat_threshold):
+    occupied = self.occupied
+    # Count occupied neighbors in binary, planes[i] is bit i of the counts.
+    planes = [0, 0, 0, 0]
+    for pairs in neighbors:
+      carry = 0
+      for offset, mask in pairs:
+        carry |= shift(occupied, offset) & mask
+      for i in range(len(planes)):
+        if not carry:
+          break
+        planes[i], carry = planes[i] ^ carry, planes[i] & carry
+
+    anyone = planes[0] | planes[1] | planes[2] | planes[3]
+    leaving = occupied & at_least(planes, leave_seat_threshold, self.seats)
+    arriving = self.seats & ~occupied & ~anyone
+    updated = (occupied & ~leaving) | arriving
+
+    if updated != occupied:
+      return Seating(self.width, self.height, self.seats, updated)
     self.changed = False
-    for h in range(self.height):
-      for w in range(self.width):
-        pos = Position(w, h)
-        value = self.seats[pos]
-
-        if value == '.':
-          n[pos] = value
-          continue
-
-        occupied = 0
-        for adj in adj_func(self.seats, pos):
-          if self.seats[adj] == '#':
-            occupied += 1
-
-        if value == 'L' and occupied == 0:
-          value = '#'
-          self.changed = True
-        elif value == '#' and occupied >= leave_seat_threshold:
-          value = 'L'
-          self.changed = True
-
-        n[pos] = value
-
-    if self.changed:
-      return Seating(self.width, self.height, n)
-    else:
-      return self
+    return self
 
 
 def until_stable(seating, *step_args, printer=None):
@@ -110,60 +162,41 @@ def until_stable(seating, *step_args, printer=None):
   return seating
 
 
-def count_states(seating): 
-  d = collections.defaultdict(int)
-  for v in seating.seats.values():
-    d[v] += 1
-  return d
-  
-
 def directions():
   # left, right, up, down
-  yield Position(-1, +0)
-  yield Position(+1, +0)
-  yield Position(+0, -1)
-  yield Position(+0, +1)
+  yield (-1, +0)
+  yield (+1, +0)
+  yield (+0, -1)
+  yield (+0, +1)
 
   # diagonals
-  yield Position(-1, -1)
-  yield Position(-1, +1)
-  yield Position(+1, -1)
-  yield Position(+1, +1)
-
-
-def p1_adjacent(_seats, pos):
-  for p in directions():
-    yield pos + p
+  yield (-1, -1)
+  yield (-1, +1)
+  yield (+1, -1)
+  yield (+1, +1)
 
 
 def part1(things, printer):
-  seating = until_stable(things, p1_adjacent, 4, printer=printer)
-  counts = count_states(seating)
-  return counts['#']
+  seating = until_stable(things, things.neighbors(sight=1), 4, printer=printer)
+  return seating.occupied.bit_count()
 
 
-def p2_adjacent(seats, start):
-  def until_seat(pos, translate):
-    while seats[pos] == '.' or pos == start:
-      pos = pos + translate
-    return pos
-
-  for p in directions():
-    pos = start + p
-    while seats[pos] == '.':
-      pos = pos + p
-
-    yield pos
+def part2(things, printer):
+  seating = until_stable(things, things.neighbors(), 5, printer=printer)
+  return seating.occupied.bit_count()
 
 
-def part2(things, printer):
-  seating = until_stable(things, p2_adjacent, 5, printer=printer)
-  counts = count_states(seating)
-  return counts['#']
+def generate(size, seed=0):
+  """A random size x size seat map, for timing big inputs."""
+  rand = random.Random(seed)
+  return [ "".join(rand.choices("L.", weights=(3, 1), k=size)) for _ in range(size) ]
 
 
-def main(filename, printer):
-  things = Seating.from_lines(load_file(filename))
+def main(filename, printer, size=None):
+  if size:
+    things = Seating.from_lines(generate(size))
+  else:
+    things = Seating.from_lines(load_file(filename))
 
   print("part 1:", part1(things, printer))
   print("part 2:", part2(things, printer))
@@ -173,10 +206,12 @@ if __name__ == "__main__":
   parser = argparse.ArgumentParser()
   parser.add_argument('input', nargs='?', default='-')
   parser.add_argument('--print', '-p', action='store_true', default=False)
+  parser.add_argument('--generate', type=int, default=None,
+      help='Run on a random seat map this big instead of the input.')
 
   printer = lambda *x: None
   args = parser.parse_args(sys.argv[1:])
 
   if args.print:
     printer = print
-  main(args.input, printer)
+  main(args.input, printer, args.generate)
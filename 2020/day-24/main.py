@@ -160,54 +160,6 @@ class Grid:
   def copy(self):
     return Grid(self.positions)
 
-  def life(self, rounds=1):
-    n = self
-    for _ in range(rounds):
-      n = n.__life_round()
-    return n
-
-  def __life_round(self):
-    alive = collections.defaultdict(int)
-    for p in self.positions:
-      # See the two update loops below for the explanation of this.
-      # alive[p] += 0
-      for d in HexGridPosition.deltas().values():
-        alive[p + d] += 1
-
-    # full update
-    next_state = Grid()
-    for point, count in alive.items():
-      prev = point in self.positions
-      if (prev and count == 1) or count == 2:
-        # next state is empty, so this always sets the tile.
-        next_state.flip(point)
-
-    # run the incremental update & asserts.
-    if False:
-      # turns out that the incremental update is subtly broken:
-      # incremental updates won't iterate through points that had no active neighbours.
-      # and if these points were black tiles, then they should be flipped. uh oh.
-      # there's a 'alive[p] += 0' line above that fixes this error.
-      # 
-      # but it really is better to just use the full rebuild loop above.
-
-      # semi-incremental update
-      updated = self.copy()
-      for point, count in alive.items():
-        prev = point in self.positions
-        flip = (prev and (count == 0 or count > 2)) or (not prev and count == 2)
-        if flip:
-          updated.flip(point)
-
-      # The two blocks above are 
-      joined = set()
-      joined.update(updated.positions)
-      joined.update(next_state.positions)
-      for point in joined:
-        assert (point in updated.positions) == (point in next_state.positions), "Point differs: {}".format(point)
-
-    return next_state
-
   def flip(self, coord):
     if coord in self.positions:
       self.positions.remove(coord)
@@ -215,6 +167,125 @@ class Grid:
       self.positions.add(coord)
 
 
+class HexLife:
+  """Black tiles as one bitset over a window of axial coordinates.
+
+  Tile (x, y) is bit (y - y0) * width + (x - x0). The window always keeps
+  an empty border, so the six neighbor shifts never wrap a live tile around
+  a row. When tiles reach the border it grows by MARGIN on every side.
+  Widths are kept to whole bytes, which lets growing copy rows as bytes.
+
+  The pattern never settles, and its box grows about a tile a round on each
+  axis, so a round costs the square of the rounds so far and a run the cube.
+  On input.txt 1,000 rounds take 0.2s, and 10,000 take about 3.5 minutes
+  with a peak of about 320MB (a round holds a dozen or so window-sized
+  ints, 12.5MB each by then).
+  """
+  MARGIN = 8
+
+  def __init__(self, width, height, x0, y0, bits):
+    assert width % 8 == 0
+    self.width = width
+    self.height = height
+    self.x0 = x0
+    self.y0 = y0
+    self.bits = bits
+    self.__masks()
+
+  def __masks(self):
+    w, h = self.width, self.height
+    self.everything = (1 << (w * h)) - 1
+    row = (1 << w) - 1
+    # Built as bytes, or'ing in one bit a row is quadratic in the window.
+    column = int.from_bytes((b"\x01" + bytes(w // 8 - 1)) * h, "little")
+    self.border = row | (row << ((h - 1) * w)) | column | (column << (w - 1))
+
+  @staticmethod
+  def from_positions(positions):
+    m = HexLife.MARGIN
+    if not positions:
+      return HexLife(2 * m, 2 * m, -m, -m, 0)
+    x0 = min(p.x for p in positions) - m
+    y0 = min(p.y for p in positions) - m
+    width = max(p.x for p in positions) - x0 + 1 + m
+    width += -width % 8
+    height = max(p.y for p in positions) - y0 + 1 + m
+    bits = 0
+    for p in positions:
+      bits |= 1 << ((p.y - y0) * width + p.x - x0)
+    return HexLife(width, height, x0, y0, bits)
+
+  def positions(self):
+    out = set()
+    digits = bin(self.bits)[:1:-1]
+    i = digits.find("1")
+    while i != -1:
+      y, x = divmod(i, self.width)
+      out.add(HexGridPosition(x + self.x0, y + self.y0, 0))
+      i = digits.find("1", i + 1)
+    return out
+
+  def grow(self):
+    m, rb = HexLife.MARGIN, self.width // 8
+    data = self.bits.to_bytes(rb * self.height, "little")
+    side = bytes(m // 8)
+    blank = bytes((rb + 2 * (m // 8)) * m)
+    rows = [ side + data[i:i + rb] + side for i in range(0, len(data), rb) ]
+    bits = int.from_bytes(blank + b"".join(rows) + blank, "little")
+    return HexLife(self.width + 2 * m, self.height + 2 * m,
+        self.x0 - m, self.y0 - m, bits)
+
+  def round(self):
+    if self.bits & self.border:
+      return self.grow().round()
+
+    bits = self.bits
+    w = self.width
+    # Neighbors in opposite or side by side pairs, each pair summed into a
+    # sum bit s and a carry bit c.
+    east, west = bits >> 1, bits << 1
+    s1, c1 = east ^ west, east & west
+    # Bits i and i - 1, which shifted are north-east and north-west, or
+    # south-east and south-west.
+    hs, hc = bits ^ west, bits & west
+    s2, c2 = hs >> w, hc >> w
+    s3, c3 = hs << (w - 1), hc << (w - 1)
+    # Each of these is as big as the window, drop them as soon as they're
+    # used up.
+    del east, west, hs, hc
+
+    # count = odd + 2 * (twos + c1 + c2 + c3)
+    a = s1 ^ s2
+    odd = a ^ s3
+    twos = (s1 & s2) | (a & s3)
+    x, y = twos ^ c1, twos & c1
+    u, v = c2 ^ c3, c2 & c3
+    del a, s1, s2, s3, c1, c2, c3, twos
+    pairs = x | y | u | v
+    # pairs ^ many is exactly one pair.
+    one = pairs ^ (y | v | (x & u))
+
+    # Black stays black with 1 black neighbor (odd, no pairs) or 2 (even, one
+    # pair), white turns black with 2. Python's & with a negative number is
+    # much slower, so a & ~b is written a ^ (a & b) throughout.
+    stay = bits & odd
+    updated = ((one ^ (one & odd)) | (stay ^ (stay & pairs))) & self.everything
+    # Same window, skip rebuilding the masks.
+    out = HexLife.__new__(HexLife)
+    out.__dict__.update(self.__dict__)
+    out.bits = updated
+    return out
+
+  def life(self, rounds=1):
+    n = self
+    for _ in range(rounds):
+      n = n.round()
+    return n
+
+  def __len__(self):
+    return self.bits.bit_count()
+
+
 def part1(things):
   g = Grid()
   for moves in things:
@@ -223,40 +294,35 @@ def part1(things):
 
   return len(g.positions)
 
-def part2(things):
+def part2(things, rounds=100):
   # Setup (part 1)
   g = Grid()
   for moves in things:
     h = HexGridPosition.zero()
     g.flip(h.moves(moves))
+  g = HexLife.from_positions(g.positions)
 
   asserts = []
   #asserts = [15, 12, 25, 14]
 
-  print("Starting:", len(g.positions))
-  #print(g.positions)
-  for i in range(100):
-    g = g.life()
-    #print(g.positions)
-      
-    #print("After day", i + 1, ":", len(g.positions))
-
-  return len(g.positions)
+  print("Starting:", len(g))
+  return len(g.life(rounds))
 
 
-def main(filename):
+def main(filename, rounds):
   things = [list(HexMove.gen_from_iterable(line)) for line in load_file(filename)]
   #print(things)
 
   HexGridPosition.test()
 
   print("part 1:", part1(things))
-  print("part 2:", part2(things))
+  print("part 2:", part2(things, rounds))
 
 
 if __name__ == "__main__":
   parser = argparse.ArgumentParser()
   parser.add_argument('input', nargs='?', default='/dev/stdin')
+  parser.add_argument('--rounds', type=int, default=100)
 
   args = parser.parse_args(sys.argv[1:])
-  main(args.input)
+  main(args.input, args.rounds)
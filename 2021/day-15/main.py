@@ -1,8 +1,8 @@
 #!/usr/bin/env python-mr
 
 from collections import defaultdict
-from queue import PriorityQueue
 from _.data.formatting.blocks import Block
+from _.games.advent_of_code.pathfind import shortest_path, shortest_path_dial
 
 class Grid:
   @staticmethod
@@ -56,9 +56,25 @@ class Grid:
 
 
 class BiggerGrid:
+  """The grid tiled `multiple` times each way, risk going up by 1 per tile.
+
+  A tile's risks only depend on how far it is from the top left (mod 9),
+  so there are never more than 9 distinct tiles: each is made the first
+  time it's needed, as bytes in row order, and shared by every copy.
+  """
   def __init__(self, grid, multiple):
-    self._g = grid
     self._multiple = multiple
+    self._height, self._width = grid.size()
+    self._base = bytes(grid[(r, c)] for r in range(self._height) for c in range(self._width))
+    self._tiles = [None] * 9
+
+  def _tile(self, shift):
+    tile = self._tiles[shift]
+    if tile is None:
+      # Risks wrap from 9 back to 1.
+      table = bytes((v - 1 + shift) % 9 + 1 if v else 0 for v in range(256))
+      tile = self._tiles[shift] = self._base.translate(table)
+    return tile
 
   def __str__(self):
     out = []
@@ -81,15 +97,13 @@ class BiggerGrid:
     if row < 0 or col < 0:
       return default
 
-    height, width = self._g.size()
-    orow, ocol = row % height, col % width
-    crow, ccol = row // height, col // width
+    crow, orow = divmod(row, self._height)
+    ccol, ocol = divmod(col, self._width)
 
     if crow >= self._multiple or ccol >= self._multiple:
       return default
 
-    c = self._g[(orow, ocol)] + crow + ccol
-    return (c - 1) % 9 + 1
+    return self._tile((crow + ccol) % 9)[orow * self._width + ocol]
 
   def __contains__(self, key):
     return self.get(key, None) is not None
@@ -101,8 +115,7 @@ class BiggerGrid:
     return val
 
   def size(self):
-    height, width = self._g.size()
-    return (height * self._multiple, width * self._multiple)
+    return (self._height * self._multiple, self._width * self._multiple)
 
   def neighbours(self, p):
     row, col = p
@@ -111,34 +124,52 @@ class BiggerGrid:
     yield (row, col - 1)
     yield (row, col + 1)
 
-
-
-def bfs(grid, start):
-  costs = { start: 0 }
-  visiting = set([])
-  visit = PriorityQueue()
-  for n in grid.neighbours(start):
-    if n in grid:
-      visit.put((grid[n], n))
-      visiting.add(n)
-  seen = set([start])
-
-  while not visit.empty():
-    priority, now = visit.get()
-    visiting.discard(now)
-    if now in seen:
-      continue
-    seen.add(now)
-
-    cs = [costs[n] for n in grid.neighbours(now) if n in costs]
-    costs[now] = grid[now] + min(cs)
-
-    for n in grid.neighbours(now):
-      if n in grid and n not in seen:
-        visit.put((costs[now] + grid[n], n))
-        visiting.add(n)
-
-  return costs
+  def dense(self):
+    """All the risks as one bytearray, row by row."""
+    out = bytearray()
+    w = self._width
+    for crow in range(self._multiple):
+      tiles = [ self._tile((crow + ccol) % 9) for ccol in range(self._multiple) ]
+      for r in range(0, self._height * w, w):
+        for t in tiles:
+          out += t[r:r + w]
+    return out
+
+
+def lowest_risk(grid, start, end, dial=False):
+  def moves(p):
+    for n in grid.neighbours(p):
+      if n in grid:
+        yield (grid[n], n)
+  goal = lambda p: p == end
+  if dial:
+    # Risk per cell is a single digit, so the bucket queue beats a heap.
+    cost, _ = shortest_path_dial([start], moves, goal, 9)
+    return cost
+  # Every cell costs at least 1, so the distance left never overestimates.
+  def distance(p):
+    return abs(end[0] - p[0]) + abs(end[1] - p[1])
+  cost, _ = shortest_path([start], moves, goal, distance)
+  return cost
+
+
+def lowest_risk_dense(grid):
+  """Top left to bottom right, cells being indexes into grid.dense()."""
+  height, width = grid.size()
+  risk = grid.dense()
+  end = len(risk) - 1
+  def moves(p):
+    if p >= width:
+      yield (risk[p - width], p - width)
+    if p + width <= end:
+      yield (risk[p + width], p + width)
+    col = p % width
+    if col:
+      yield (risk[p - 1], p - 1)
+    if col + 1 < width:
+      yield (risk[p + 1], p + 1)
+  cost, _ = shortest_path_dial([0], moves, lambda p: p == end, 9, len(risk))
+  return cost
 
 
 LOAD = "content"
@@ -146,19 +177,28 @@ def REWRITE(lines):
   return Grid.parse(lines)
 
 
+def TEST(inputs):
+  # Both searches, with and without the heuristic, on the top left corner.
+  height, width = inputs.size()
+  size = (min(height, 12), min(width, 12))
+  corner = Grid({ p: inputs[p] for p in inputs if p[0] < size[0] and p[1] < size[1] }, size)
+  end = (size[0] - 1, size[1] - 1)
+  costs = [ lowest_risk(corner, (0,0), end, dial) for dial in (False, True) ]
+  moves = lambda p: ((corner[n], n) for n in corner.neighbours(p) if n in corner)
+  costs.append(shortest_path([(0,0)], moves, lambda p: p == end)[0])
+  assert len(set(costs)) == 1, costs
+
+
 def PART1(inputs):
   print(inputs)
   print(inputs.size())
-  costs = bfs(inputs, (0,0))
   r, c = inputs.size()
-  return costs[(r - 1, c - 1)]
+  return lowest_risk(inputs, (0,0), (r - 1, c - 1))
 
 
 def PART2(inputs):
   bigger = BiggerGrid(inputs, 5)
   print(bigger)
   print(bigger.size())
-  costs = bfs(bigger, (0,0))
-  r, c = bigger.size()
-  return costs[(r - 1, c - 1)]
+  return lowest_risk_dense(bigger)
 
@@ -6,6 +6,9 @@ from itertools import islice, pairwise
 from typing import NamedTuple
 from _.data.formatting.blocks import Block
 
+import bisect
+import math
+
 @dataclass
 class Range:
   dst: int
@@ -77,24 +80,107 @@ class ThingMap:
     breaks.sort()
     return breaks
 
-  def mapr(self, range):
-    # Map a range forward. It should never get split!
-    #print("mapr", "range", range)
-    #print("mapr", "maps", self.mappings)
-    for m in self.mappings:
-      #print("mapr", m, m.delta())
-      if range.src + range.len < m.src:
-        #print("smaller")
-        return range
+  def piecewise(self):
+    return Piecewise.from_ranges(self.mappings)
+
 
-      if range.src >= m.src and range.src + range.len <= m.src + m.len:
-        d = m.delta()
-        #print(d)
-        return Range(range.src + d, range.src + d, range.len)
+class Piecewise:
+  """x -> x + deltas[i] for starts[i] <= x < starts[i + 1].
 
-    last = self.mappings[-1]
-    assert last.src + last.len <= range.src, f"{last.src + last.len} <= {range.src}"
-    return range
+  starts[0] is 0, and the last piece goes on forever. Pieces next to each
+  other always have different deltas.
+  """
+  def __init__(self, starts, deltas):
+    self.starts = []
+    self.deltas = []
+    for s, d in zip(starts, deltas):
+      if self.deltas and self.deltas[-1] == d:
+        continue
+      self.starts.append(s)
+      self.deltas.append(d)
+    self.__lows = None
+
+  @staticmethod
+  def from_ranges(ranges):
+    starts, deltas = [0], [0]
+    for r in sorted(ranges, key=lambda r: r.src):
+      if r.src == starts[-1]:
+        deltas[-1] = r.delta()
+      else:
+        starts.append(r.src)
+        deltas.append(r.delta())
+      # Everything not in a range maps to itself.
+      starts.append(r.src + r.len)
+      deltas.append(0)
+    return Piecewise(starts, deltas)
+
+  def __len__(self):
+    return len(self.starts)
+
+  def __call__(self, x):
+    return x + self.deltas[bisect.bisect_right(self.starts, x) - 1]
+
+  def end(self, i):
+    return self.starts[i + 1] if i + 1 < len(self.starts) else math.inf
+
+  def then(self, other):
+    """other(self(x)) as one Piecewise."""
+    starts, deltas = [], []
+    for i, (s, d) in enumerate(zip(self.starts, self.deltas)):
+      # Where this piece lands, cut up by the pieces of other.
+      lo, hi = s + d, self.end(i) + d
+      j = bisect.bisect_right(other.starts, lo) - 1
+      while lo < hi:
+        starts.append(lo - d)
+        deltas.append(d + other.deltas[j])
+        lo = other.end(j)
+        j += 1
+    return Piecewise(starts, deltas)
+
+  def map_range(self, lo, hi):
+    """Where [lo, hi) ends up, as [start, end) ranges."""
+    i = bisect.bisect_right(self.starts, lo) - 1
+    while lo < hi:
+      end = min(hi, self.end(i))
+      yield (lo + self.deltas[i], end + self.deltas[i])
+      lo = end
+      i += 1
+
+  def __sparse(self):
+    # lows[k][i]: the least of the 2**k pieces from i, where each piece
+    # starts.
+    if self.__lows is None:
+      row = [ s + d for s, d in zip(self.starts, self.deltas) ]
+      self.__lows = [row]
+      width = 1
+      while 2 * width <= len(self.starts):
+        row = [ min(row[i], row[i + width]) for i in range(len(row) - width) ]
+        self.__lows.append(row)
+        width *= 2
+    return self.__lows
+
+  def min_image(self, lo, hi):
+    """The least value [lo, hi) maps to: two bisects and a table lookup."""
+    return self.min_images([(lo, hi)])[0]
+
+  def min_images(self, ranges):
+    """min_image for every (lo, hi) in ranges, in one go."""
+    starts, deltas = self.starts, self.deltas
+    lows = self.__sparse()
+    right = bisect.bisect_right
+    out = []
+    for lo, hi in ranges:
+      first = right(starts, lo) - 1
+      last = right(starts, hi - 1) - 1
+      # Every piece after the first starts inside the range, and is smallest
+      # where it starts.
+      best = lo + deltas[first]
+      if last > first:
+        k = (last - first).bit_length() - 1
+        row = lows[k]
+        best = min(best, row[first + 1], row[last + 1 - (1 << k)])
+      out.append(best)
+    return out
 
 
 def overlapping_map_ranges(maps):
@@ -162,31 +248,74 @@ def find_map(name, maps):
       return m
   raise Exception(f"no map with name {name}")
 
-def convert_to(items, start, end, maps):
-  if start == end:
-    return items
-
+def fuse(start, end, maps):
+  """Every map from start to end, composed into one Piecewise."""
+  fused = Piecewise([0], [0])
   current = start
   while current != end:
-    #print(current)
     nextmap = find_map(current, maps)
-    nextitems = [nextmap.map(i) for i in items]
+    fused = fused.then(nextmap.piecewise())
     current = nextmap.dst_type
-    items = nextitems
+  return fused
+
 
-  return items
+def TEST(inputs):
+  # The fused map against going through every layer, around every
+  # breakpoint and the seeds. Big maps, like the real input, only check an
+  # even sample of those.
+  seeds, maps = inputs
+  fused = fuse("seed", "location", maps)
+  def slow(x):
+    return convert(x, "seed", "location", maps)
+
+  points = set(seeds)
+  for s in fused.starts:
+    points.update((s - 1, s, s + 1))
+  points = sorted(p for p in points if p >= 0)
+  if len(fused.starts) > 50:
+    points = points[::len(points) // 10]
+  for x in points:
+    assert fused(x) == slow(x), x
+  for lo in points[::max(1, len(points) // 50)]:
+    hi = lo + 5
+    assert fused.min_image(lo, hi) == min(slow(x) for x in range(lo, hi)), lo
+
+  # Ranges over many pieces, up to the whole domain, against carrying the
+  # range through every layer and taking the least of what comes out.
+  layers = []
+  current = "seed"
+  while current != "location":
+    m = find_map(current, maps)
+    layers.append(m.piecewise())
+    current = m.dst_type
+  def slow_min(lo, hi):
+    ranges = [(lo, hi)]
+    for layer in layers:
+      ranges = [ r for a, b in ranges for r in layer.map_range(a, b) ]
+    return min(a for a, _ in ranges)
+
+  top = max(points) + 1
+  wide = [(0, top), (0, 2**32)]
+  step = max(1, len(points) // 20)
+  for i in range(0, len(points), step):
+    for j in range(i + 1, len(points), step):
+      wide.append((points[i], points[j]))
+  for (lo, hi), low in zip(wide, fused.min_images(wide)):
+    assert low == slow_min(lo, hi), (lo, hi)
+
+def convert(x, start, end, maps):
+  current = start
+  while current != end:
+    m = find_map(current, maps)
+    x = m.map(x)
+    current = m.dst_type
+  return x
 
 
 def PART1(inputs):
   seeds, maps = inputs
-  #print(seeds)
-  #print(maps)
-  ends = []
-  for s in seeds:
-    end = convert_to([s], "seed", "location", maps)
-    ends.extend(end)
-    print(s, "=>", end[0])
-  return min(ends)
+  fused = fuse("seed", "location", maps)
+  return min(fused(s) for s in seeds)
 
 
 def seed_range(iterable):
@@ -197,65 +326,16 @@ def seed_range(iterable):
     except StopIteration:
       return
     length = next(it)
-    yield Range(start, start, length)
-
-
-def split_range(range, breaks):
-  for start in breaks:
-    if range.len == 0:
-      return
-    if range.src > start:
-      continue
-
-    if range.src + range.len < start:
-      yield range
-      return
-
-    if start != range.src:
-      yield Range(range.src, range.src, start - range.src)
-    range = Range(start, start, range.src + range.len - start)
-
-  if range.len != 0:
-    yield range
+    yield (start, start + length)
 
 
 def PART2(inputs):
   seeds, maps = inputs
   seeds = list(seed_range(seeds))
-  #print("seeds:", " ".join([f"{s.src} {s.len}" for s in seeds]))
-  print("seeds:", seeds, "amount:", sum([s.len for s in seeds]))
-  seeds = ThingMap("seed", "seed", seeds)
-  #print(maps)
+  print("seeds:", seeds, "amount:", sum([hi - lo for lo, hi in seeds]))
 
   # For part two there's waaaaaaaay too many seeds to go forward one at a time.
-  # So instead we built up ThingMap.mapr and split_range to map an entire range
-  # through a mapping layer. This is much much faster.
-
-  seed_ranges = list(seeds.mappings)
-  for layer in maps:
-    # Some of the code was resorting this list... :|
-    # And it broke my code for a long time...
-    #layer.mappings.sort(key=lambda r: r.src)
-    print("layer:", layer.src_type, layer.dst_type)
-    breaks = layer.breakpoints()
-    # Sorting the ranges only necessary for display.
-    #seed_ranges.sort(key=lambda r: r.src)
-    #print("breaks", breaks)
-    #print("ranges", [(s.src, s.src + s.len - 1) for s in seed_ranges])
-    new_ranges = []
-    for r in seed_ranges:
-      #print("processing", r)
-      split = split_range(r, breaks)
-      #print(split)
-      for s in split:
-        mapped = layer.mapr(s)
-        #print(" ", s, "=>", mapped)
-        new_ranges.append(mapped)
-        pass
-
-    seed_ranges = new_ranges
-
-  seed_ranges.sort(key=lambda r: r.src)
-  #print("done", [(s.src, s.src + s.len - 1) for s in seed_ranges])
-
-  return seed_ranges[0].src
+  # So instead every layer gets composed into one seed -> location map, and
+  # each seed range only has to look up the lowest location it touches.
+  fused = fuse("seed", "location", maps)
+  return min(fused.min_images(seeds))
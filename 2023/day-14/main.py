@@ -12,17 +12,16 @@ def REWRITE(lines):
   return lines
 
 def TEST(inputs):
-
-  assert list(rangedir(1, 4, DIRECTIONS["UP"])) == [1,2,3]
-  assert list(rangedir(1, 4, DIRECTIONS["LEFT"])) == [1,2,3]
-  assert list(rangedir(1, 4, DIRECTIONS["DOWN"])) == [3,2,1]
-  assert list(rangedir(1, 4, DIRECTIONS["RIGHT"])) == [3,2,1]
-
-  assert coord(2, 3, DIRECTIONS["UP"]) == Point(3, 2)
-  assert coord(2, 3, DIRECTIONS["LEFT"]) == Point(2, 3)
-  assert coord(2, 3, DIRECTIONS["DOWN"]) == Point(3, 2)
-  assert coord(2, 3, DIRECTIONS["RIGHT"]) == Point(2, 3)
-  pass
+  # The bitset tilt against rolling the rocks by hand, whole boards and in
+  # every direction, for a couple of spin cycles.
+  rr = RollingRocks(inputs)
+  assert roll(inputs, "UP") == [ "".join(l) for l in bubble_up(inputs) ]
+  rocks, lines = rr.rocks, inputs
+  for _ in range(2):
+    for d in ("UP", "LEFT", "DOWN", "RIGHT",):
+      rocks = rr.tilt(rocks, d)
+      lines = roll(lines, d)
+      assert rr.show(rocks) == "\n".join(lines), d
 
 def load(rocks):
   maxrow, maxcol = len(rocks), len(rocks[0])
@@ -34,7 +33,7 @@ def load(rocks):
 
   return total
 
-def PART1(inputs):
+def bubble_up(inputs):
   inputs = [list(l) for l in inputs]
   maxrow, maxcol = len(inputs), len(inputs[0])
 
@@ -48,149 +47,123 @@ def PART1(inputs):
           changed = True
       if not changed:
         break
+  return inputs
+
+def roll(lines, direction):
+  """Tilts the board the slow way, a line at a time.
+
+  Every row (or column) is cut up at the walls, and each piece gets its
+  rocks packed against the end it's tilted towards.
+  """
+  def pack(line):
+    return "#".join("O" * p.count("O") + "." * p.count(".") for p in line.split("#"))
+
+  if direction in ("UP", "DOWN"):
+    lines = [ "".join(col) for col in zip(*lines) ]
+  if direction in ("DOWN", "RIGHT"):
+    lines = [ pack(l[::-1])[::-1] for l in lines ]
+  else:
+    lines = [ pack(l) for l in lines ]
+  if direction in ("UP", "DOWN"):
+    lines = [ "".join(row) for row in zip(*lines) ]
+  return lines
 
-  for l in inputs:
-    #print("".join(l))
-    pass
+def PART1(inputs):
+  rr = RollingRocks(inputs)
 
   # Attempt 1: 194150 - no.
   # Attempt 2: 108614 - after fixing math error in load.
-  return load(inputs)
-
-
-DIRECTIONS = {
-  # Row, column - (0,0) in the top-left.
-  "UP": Point(-1, 0),
-  "DOWN": Point(+1, 0),
-  "LEFT": Point(0, -1),
-  "RIGHT": Point(0, +1)
-}
-AXIS = {
-  "UP": "VERT",
-  "DOWN": "VERT",
-  "LEFT": "HORZ",
-  "RIGHT": "HORZ",
-}
-
-def rangedir(lo, hi, direction):
-  d = direction.x + direction.y
-  assert d == 1 or d == -1
-  if d < 0:
-    return range(lo, hi, 1)
-  return range(hi - 1, lo - 1, -1)
-
-def coord(orth, slide, direction):
-  if direction.y == 0:
-    return Point(slide, orth)
-  return Point(orth, slide)
-  
-
-@dataclass(unsafe_hash=True)
+  return rr.load(rr.tilt(rr.rocks, "UP"))
+
+
 class RollingRocks:
-  size: tuple
-  rocks: dict
-
-  def slide(self, direction):
-    direction = DIRECTIONS[direction]
-
-    cpy = RollingRocks(self.size, self.rocks)
-    #print("sliding rocks:", direction)
-
-    for orthogonal in range(1, cpy.size[0] - 1):
-      for slide in rangedir(1, cpy.size[0] - 1, direction):
-        p = coord(orthogonal, slide, direction)
-        if cpy.rocks.get(p, ".") == "O":
-          n = p
-          while cpy.rocks.get(n + direction, ".") == ".":
-            n = n + direction
-          del cpy.rocks[p]
-          cpy.rocks[n] = "O"
-          #print("found rock", p, "placing", n)
-
-    return cpy
-
-  def load(self, direction):
-    if direction != "UP":
-      return NotImplemented
-
-    # Recall there's a border of "#"!
-    maxrow = self.size[0]
+  """The board as bitsets, cell (row, col) is bit row * (cols + 1) + col.
+
+  The extra column at the end of every row is never open, so nothing can
+  roll from one row onto the next. A tilt moves every rock with an empty
+  cell ahead of it one step, the whole board at once, until none can move.
+  A board's rocks are one int, which is also what gets hashed to find the
+  spin cycle repeating.
+  """
+  def __init__(self, lines):
+    self.rows, self.cols = len(lines), len(lines[0])
+    self.stride = self.cols + 1
+    self.open = RollingRocks.__bits(lines, ".O")
+    self.rocks = RollingRocks.__bits(lines, "O")
+    # How far away the next cell in each direction is.
+    self.offsets = {
+      "UP": -self.stride,
+      "DOWN": self.stride,
+      "LEFT": -1,
+      "RIGHT": 1,
+    }
+
+  @staticmethod
+  def __bits(lines, chars):
+    table = str.maketrans({ c: "1" if c in chars else "0" for c in ".O#" })
+    # The first cell is the lowest bit, which int() wants last.
+    return int("".join(l.translate(table) + "0" for l in lines)[::-1], 2)
+
+  def tilt(self, rocks, direction):
+    offset = self.offsets[direction]
+    while True:
+      empty = self.open & ~rocks
+      # Rocks with an empty cell right ahead of them.
+      if offset > 0:
+        movers = rocks & (empty >> offset)
+        moved = movers << offset
+      else:
+        movers = rocks & (empty << -offset)
+        moved = movers >> -offset
+      if not movers:
+        return rocks
+      rocks = (rocks ^ movers) | moved
+
+  def cycle(self, rocks):
+    for d in ("UP", "LEFT", "DOWN", "RIGHT",):
+      rocks = self.tilt(rocks, d)
+    return rocks
+
+  def load(self, rocks):
+    # Load on the north beams.
+    cells = format(rocks, "0{}b".format(self.rows * self.stride))[::-1]
     total = 0
-    for r in range(maxrow):
-      mult = maxrow - r - 1
-      for c in range(self.size[1]):
-        p = Point(r, c)
-        total += int(self.rocks.get(p, ".") == "O") * mult
+    for r in range(self.rows):
+      total += cells.count("1", r * self.stride, (r + 1) * self.stride) * (self.rows - r)
     return total
 
-  def __str__(self):
-    b = Block()
-    for row in range(self.size[0]):
-      c = Block()
-      for col in range(self.size[1]):
-        p = Point(row, col)
-        if p not in self.rocks:
-          c += "."
-        else:
-          c += self.rocks[p]
-      b |= c
-    return str(b)
-
-  @staticmethod
-  def parse(lines):
-    # Wrap the input in "#" to make math easier for sliding iteration.
-    # Warning: this changes the load math!!
-    col = len(lines[0])
-    lines = (["#" * col]) + lines + (["#" * col])
-    lines = ["#" + l + "#" for l in lines]
-
-    size = (len(lines), len(lines[0]),)
-    rocks = {}
-    for row, line in enumerate(lines):
-      for col, val in enumerate(line):
-        if val == ".":
-          continue
-        rocks[Point(row, col)] = val
-    return RollingRocks(size, rocks)
+  def show(self, rocks):
+    cells = format(rocks, "0{}b".format(self.rows * self.stride))[::-1]
+    walls = format(self.open, "0{}b".format(self.rows * self.stride))[::-1]
+    out = []
+    for r in range(self.rows):
+      line = ""
+      for c in range(r * self.stride, r * self.stride + self.cols):
+        line += "O" if cells[c] == "1" else "." if walls[c] == "1" else "#"
+      out.append(line)
+    return "\n".join(out)
 
 
 def PART2(inputs):
   # Now rotate in all directions, but do it 1000000000 times.
-  #print(inputs)
-  #print(load(inputs))
-  rr = RollingRocks.parse(inputs)
-  #rr = RollingRocks.parse("...\n.O.\n...".split("\n"))
-  print(rr)
-  #print(rr.size)
-  #print(rr.load("UP"))
-  #rs = rr.slide("UP")
-  #print(rs)
-  #print(rs.load("UP"))
-  s = rr
-  states = {}
-  idx = 0
+  rr = RollingRocks(inputs)
+  s = rr.rocks
+  states = {s: 0}
+  # Rocks after each number of cycles.
+  history = [s]
   limit = 1000000000
-  while idx < limit:
-    idx += 1
-    for d in ("UP", "LEFT", "DOWN", "RIGHT",):
-      s = s.slide(d)
-
-    stringify = str(s)
-    if stringify in states:
-      start = states[stringify]
+  for idx in range(1, limit + 1):
+    s = rr.cycle(s)
+    if s in states:
+      start = states[s]
       cycleLength = idx - start
-      remaining = limit - idx
-      offset = remaining % cycleLength
-      print("cycle", start, "->", idx, "len:", cycleLength, "offset", offset)
-      # Turn off cycle detection.
-      states = {}
-      idx = limit - offset
-      continue
-
-    states[stringify] = idx
+      print("cycle", start, "->", idx, "len:", cycleLength)
+      s = history[start + (limit - start) % cycleLength]
+      break
+    states[s] = idx
+    history.append(s)
 
   # Attempt 1: 92201 - too low
   # Attempt 2: 99764 - after fixing rotation order. - too high
   # Attempt 3: 96447 - after fixing down & right sliding, and off-by-1 in cycle count.
-  print(s)
-  return s.load("UP")
+  return rr.load(s)
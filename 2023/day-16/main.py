@@ -32,6 +32,25 @@ def TEST(inputs):
   assert MIRRORS["/"](DIRECTIONS["LEFT"]) == DIRECTIONS["DOWN"]
   assert MIRRORS["/"](DIRECTIONS["DOWN"]) == DIRECTIONS["LEFT"]
 
+  # The cached graph against tracing the beam by hand, from every edge.
+  # Tracing is slow and so is building the graph for a big grid, so big
+  # grids are cut down to their top left corner first.
+  (maxrow, maxcol), grid = inputs
+  if maxrow * maxcol > 900:
+    maxrow, maxcol = min(maxrow, 30), min(maxcol, 30)
+    grid = { p: c for p, c in grid.items() if p.x < maxrow and p.y < maxcol }
+  beams = BeamGraph((maxrow, maxcol), grid)
+  starts = []
+  for row in range(maxrow):
+    starts.append((Point(row, -1), DIRECTIONS["RIGHT"]))
+    starts.append((Point(row, maxcol), DIRECTIONS["LEFT"]))
+  for col in range(maxcol):
+    starts.append((Point(-1, col), DIRECTIONS["DOWN"]))
+    starts.append((Point(maxrow, col), DIRECTIONS["UP"]))
+  for start, direction in starts:
+    seen, _ = beamtrace(grid, start, direction)
+    assert beams.energized(start, direction) == len(seen), (start, direction)
+
 DIRECTIONS = {
   # Row, column - (0,0) in the top-left.
   "UP": Point(-1, 0),
@@ -94,30 +113,144 @@ def beamtrace(grid, startp, startd):
 
   return (seen, states)
 
+def turns(cell, direction):
+  """Directions a beam leaves cell in, after coming in going direction."""
+  if cell in MIRRORS:
+    return [MIRRORS[cell](direction)]
+  return list(beamsplit(cell, direction))
+
+
+class BeamGraph:
+  """Beams between mirrors & splitters, with what each one energizes cached.
+
+  A node is a beam leaving a mirror or splitter in one direction. It lights
+  a straight run of cells up to the next mirror or splitter (included), and
+  from there carries on as the nodes that one sends out. Loops of nodes are
+  condensed into strongly connected components, every node in one energizes
+  the same cells. Energized cells are bitsets, with bit row * cols + col.
+  """
+  def __init__(self, size, grid):
+    self.rows, self.cols = size
+    self.grid = grid
+    # (point, direction) -> node
+    self.nodes = {}
+    # Per node, the cells it lights by itself & the nodes it continues as.
+    self.segments = []
+    self.edges = []
+
+    for point, cell in grid.items():
+      if cell == ".":
+        continue
+      leaving = set()
+      for direction in DIRECTIONS.values():
+        leaving.update(turns(cell, direction))
+      for direction in leaving:
+        self.nodes[(point, direction)] = len(self.nodes)
+    for (point, direction) in self.nodes:
+      bits, after = self.run(point, direction)
+      self.segments.append(bits)
+      self.edges.append(after)
+
+    self.lit = self.condense()
+
+  def run(self, point, direction):
+    """Cells lit going straight from point (not included), and the nodes after."""
+    bits = 0
+    while True:
+      point = point + direction
+      cell = self.grid.get(point, "#")
+      if cell == "#":
+        return bits, []
+      bits |= 1 << (point.x * self.cols + point.y)
+      if cell != ".":
+        return bits, [ self.nodes[(point, d)] for d in turns(cell, direction) ]
+
+  def condense(self):
+    """Everything each node energizes, through Tarjan's SCC algorithm.
+
+    Components come out with everything they lead to already done, so each
+    one is its own segments plus the cached bitsets of those.
+    """
+    n = len(self.segments)
+    index = [None] * n
+    low = [0] * n
+    onstack = [False] * n
+    stack = []
+    component = [None] * n
+    lit = []
+    counter = 0
+
+    for root in range(n):
+      if index[root] is not None:
+        continue
+      work = [(root, 0)]
+      while work:
+        v, i = work.pop()
+        if i == 0:
+          index[v] = low[v] = counter
+          counter += 1
+          stack.append(v)
+          onstack[v] = True
+        edges = self.edges[v]
+        if i < len(edges):
+          work.append((v, i + 1))
+          w = edges[i]
+          if index[w] is None:
+            work.append((w, 0))
+          elif onstack[w]:
+            low[v] = min(low[v], index[w])
+          continue
+
+        # Done with v's edges, pass its low link up to whoever explored it.
+        if work:
+          parent = work[-1][0]
+          low[parent] = min(low[parent], low[v])
+        if low[v] != index[v]:
+          continue
+
+        members = []
+        while True:
+          w = stack.pop()
+          onstack[w] = False
+          component[w] = len(lit)
+          members.append(w)
+          if w == v:
+            break
+        bits = 0
+        for w in members:
+          bits |= self.segments[w]
+          for x in self.edges[w]:
+            if component[x] != component[w]:
+              bits |= lit[component[x]]
+        lit.append(bits)
+
+    return [ lit[component[v]] for v in range(n) ]
+
+  def energized(self, start, direction):
+    """How many cells a beam entering at start going direction energizes."""
+    bits, after = self.run(start, direction)
+    for node in after:
+      bits |= self.lit[node]
+    return bits.bit_count()
+
+
 def PART1(inputs):
   size, grid = inputs
-  seen, _ = beamtrace(grid, Point(0, -1), DIRECTIONS["RIGHT"])
-  print(seen)
   # Attempt 1: 7496 - yes.
-  return len(seen)
+  return BeamGraph(size, grid).energized(Point(0, -1), DIRECTIONS["RIGHT"])
 
 def PART2(inputs):
   (maxrow, maxcol), grid = inputs
+  beams = BeamGraph((maxrow, maxcol), grid)
 
-  # Do part 1, but a lot.
-  energies = defaultdict(list)
+  # Do part 1, but a lot. Every start reuses what the graph cached.
+  best = 0
   for row in range(maxrow):
-    seen, _ = beamtrace(grid, Point(row, -1), DIRECTIONS["RIGHT"])
-    energies[len(seen)].append(Point(row, 0))
-
-    seen, _ = beamtrace(grid, Point(row, maxcol), DIRECTIONS["LEFT"])
-    energies[len(seen)].append(Point(row, maxcol - 1))
-
+    best = max(best,
+        beams.energized(Point(row, -1), DIRECTIONS["RIGHT"]),
+        beams.energized(Point(row, maxcol), DIRECTIONS["LEFT"]))
   for col in range(maxcol):
-    seen, _ = beamtrace(grid, Point(-1, col), DIRECTIONS["DOWN"])
-    energies[len(seen)].append(Point(row, 0))
-
-    seen, _ = beamtrace(grid, Point(maxrow, col), DIRECTIONS["UP"])
-    energies[len(seen)].append(Point(maxrow - 1, col))
-
-  return max(energies.keys())
+    best = max(best,
+        beams.energized(Point(-1, col), DIRECTIONS["DOWN"]),
+        beams.energized(Point(maxrow, col), DIRECTIONS["UP"]))
+  return best
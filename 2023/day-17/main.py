@@ -7,49 +7,38 @@ from typing import NamedTuple
 from _.data.formatting.blocks import Block
 from _.data.structures.point import Point
 from _.games.advent_of_code.utils import read_numbers
+from _.games.advent_of_code.pathfind import shortest_path, shortest_path_dial
 
 import math
 import sys
 
 
-@dataclass(unsafe_hash=True, frozen=True)
-class StrDict:
-  size: tuple
-  content: str
+class HeatGrid(NamedTuple):
+  rows: int
+  cols: int
+  # Heat lost entering each cell, row by row.
+  costs: list
 
   @staticmethod
   def parse(lines):
-    # newline for printing
-    c = "\n".join(lines)
-    return StrDict((len(lines), len(lines[0])), c)
-
-  def __contains__(self, val):
-    assert type(val) == Point
-    if val.x < 0 or val.y < 0:
-      return False
-    if val.x >= self.size[0] or val.y >= self.size[0]:
-      return False
-    return True
-
-  def __getitem__(self, val):
-    if val not in self:
-      raise KeyError
-    return self.content[val.x * (1 + self.size[0]) + val.y]
-
-  def __str__(self):
-    return self.content
+    return HeatGrid(len(lines), len(lines[0]), [ int(c) for l in lines for c in l ])
 
 LOAD = "content"
 def REWRITE(lines):
-  return StrDict.parse(lines)
+  return HeatGrid.parse(lines)
 
-DIRECTIONS = {
-  # Row, column - (0,0) in the top-left.
-  "UP": Point(-1, 0),
-  "DOWN": Point(+1, 0),
-  "LEFT": Point(0, -1),
-  "RIGHT": Point(0, +1)
-}
+def TEST(inputs):
+  # The bucket queue against a plain heap, on the top-left corner of the
+  # grid so the heap doesn't take long.
+  grid = inputs
+  size = min(grid.rows, grid.cols, 40)
+  corner = HeatGrid(size, size,
+      [ grid.costs[r * grid.cols + c] for r in range(size) for c in range(size) ])
+  end = size * size - 1
+  for least, most in ((1, 3), (4, 10)):
+    moves = crucible(corner, least, most)
+    cost, _ = shortest_path([(0, None)], moves, lambda s: s[0] == end)
+    assert least_heat(corner, moves, most) == cost, (least, most)
 
 # Had to go to r/aoc for this, but they
 # suggested removing the "moves count" and
@@ -57,139 +46,45 @@ DIRECTIONS = {
 #
 # This means that at any point in the graph, our
 # only choice is to turn, and never go straight!
-def moves(grid, pos, curdir):
-  assert curdir.x == 0 or curdir.y == 0
-  # use two ifs to ensure Point(0, 0) works.
-  if curdir.x == 0:
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(n, 0)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(1, 0))
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(-n, 0)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(-1, 0))
-  if curdir.y == 0:
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(0, n)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(0, 1))
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(0, -n)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(0, -1))
-
-def TEST(inputs):
-  pass
-
-# Cache str -> int...
-@cache
-def gridcost(grid, pos):
-  if pos not in grid:
-    return grid.size[0] * grid.size[1] * 1000
-  return int(grid[pos])
-
-def bfs(grid, movefn):
-  cache = dict()
-  end = Point(grid.size[0] - 1, grid.size[1] - 1)
-
-  # all (point, dir) -> thing
-  lowestcost = {}
-  seen = set()
-  # these mirror each other to avoid duplicates.
-  processing = set()
-  process = list()
-
-  start = (Point(0, 0), Point(0, 0))
-  lowestcost[start] = 0
-  process.append(start)
-  processing.add(start)
-
-  while process:
-    n = process.pop(0)
-    processing.remove(n)
-    assert n not in seen
-    seen.add(n)
-
-    #print(n)
-
-    p, curdir = n
-    herecost = lowestcost[n]
-
-    options = list(movefn(grid, p, curdir))
-    options.sort(key=lambda x: x[0])
-    sort = False
-    for movecost, endpos, direction in options:
-      if endpos not in grid:
-        continue
-      key = (endpos, direction)
-      if key not in lowestcost or lowestcost[key] > herecost + movecost:
-        lowestcost[key] = herecost + movecost
-        #print(n, key, lowestcost[key])
-        sort = True
-      if key not in seen and key not in processing:
-        sort = True
-        processing.add(key)
-        process.append(key)
-
-    if sort:
-      process.sort(key = lambda k: lowestcost[k])
-      #print(process)
-
-
-  #print(lowestcost)
-  return min(lowestcost[(end, Point(1, 0))], lowestcost[(end, Point(0, 1))])
+#
+# States are (cell, axis): the cell index (row * cols + col) and which way
+# it got there, 0 for up/down and 1 for left/right (None at the start).
+def crucible(grid, least, most):
+  """moves() for a crucible that goes least to most blocks before turning."""
+  rows, cols, costs = grid
+  def moves(state):
+    pos, axis = state
+    row, col = divmod(pos, cols)
+    if axis != 0:
+      for step, room in ((cols, rows - 1 - row), (-cols, row)):
+        cost = 0
+        for n in range(1, min(most, room) + 1):
+          cost += costs[pos + n * step]
+          if n >= least:
+            yield (cost, (pos + n * step, 0))
+    if axis != 1:
+      for step, room in ((1, cols - 1 - col), (-1, col)):
+        cost = 0
+        for n in range(1, min(most, room) + 1):
+          cost += costs[pos + n * step]
+          if n >= least:
+            yield (cost, (pos + n * step, 1))
+  return moves
+
+def least_heat(grid, moves, most):
+  end = grid.rows * grid.cols - 1
+  # Heat loss per cell is a single digit, so the bucket queue beats a heap.
+  cost, _ = shortest_path_dial([(0, None)], moves, lambda s: s[0] == end, 9 * most)
+  return cost
 
 
 def PART1(inputs):
   grid = inputs
-  return bfs(grid, moves)
-
-def move_ultracrucible(grid, pos, curdir):
-  assert curdir.x == 0 or curdir.y == 0
-  # use two ifs to ensure Point(0, 0) works.
-  if curdir.x == 0:
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(n, 0)
-      cost += gridcost(grid, npos)
-    for n in range(4, 11):
-      npos = pos + Point(n, 0)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(1, 0))
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(-n, 0)
-      cost += gridcost(grid, npos)
-    for n in range(4, 11):
-      npos = pos + Point(-n, 0)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(-1, 0))
-  if curdir.y == 0:
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(0, n)
-      cost += gridcost(grid, npos)
-    for n in range(4, 11):
-      npos = pos + Point(0, n)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(0, 1))
-    cost = 0
-    for n in range(1, 4):
-      npos = pos + Point(0, -n)
-      cost += gridcost(grid, npos)
-    for n in range(4, 11):
-      npos = pos + Point(0, -n)
-      cost += gridcost(grid, npos)
-      yield (cost, npos, Point(0, -1))
+  return least_heat(grid, crucible(grid, 1, 3), 3)
 
 def PART2(inputs):
   grid = inputs
   # Attempt 1: 270 - too low
-  # fixed costs in move_ultracrucible
+  # fixed the costs of the 4 to 10 step moves, now crucible(grid, 4, 10)
   # Attempt 2: 993
-  return bfs(grid, move_ultracrucible)
+  return least_heat(grid, crucible(grid, 4, 10), 10)
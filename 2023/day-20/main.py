@@ -1,6 +1,6 @@
 #!/usr/bin/env python-mr
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass
 from typing import NamedTuple
 from _.data.formatting.blocks import Block
@@ -8,215 +8,245 @@ from _.games.advent_of_code.utils import read_numbers
 
 import math
 
-class RXException(Exception):
-  pass
-
-class Signal(NamedTuple):
-  name: str
-  state: bool
-
-@dataclass
-class Through:
-  name: str
-  outputs: list[str]
-
-  @staticmethod
-  def parse(line):
-    name, outs = line.split(" -> ")
-    return Through(name, outs.split(", "))
-
-@dataclass
-class FlipFlop:
-  name: str
-  outputs: list[str]
-  # TODO: move out of this class, removes state from classes.
-  state: bool
+class Network:
+  """The modules lowered to ints, with all their state in bitsets.
+
+  Bit i of `flips` is flip-flop i being on, and bit j of `memory[i]` is
+  conjunction i having last received a high pulse from module j. The
+  memory is set when a pulse is delivered, not when it's sent, since
+  pulses still in the queue haven't reached the conjunction yet.
+  """
+  BROADCAST, FLIPFLOP, CONJUNCTION, OUTPUT = range(4)
+
+  def __init__(self, names, kinds, outputs):
+    self.names = names
+    self.ids = { n: i for i, n in enumerate(names) }
+    self.kinds = kinds
+    self.outputs = outputs
+    # Bitset of each module's inputs.
+    self.inputs = [0] * len(names)
+    for i, outs in enumerate(outputs):
+      for o in outs:
+        self.inputs[o] |= 1 << i
+    self.broadcast = self.ids["broadcaster"]
+    self.reset()
 
   @staticmethod
-  def parse(line):
-    assert line[0] == "%"
-    name, outs = line[1:].split(" -> ")
-    return FlipFlop(name, outs.split(", "), False)
-
-@dataclass
-class Conjunction:
-  name: str
-  inputs: list[str]
-  outputs: list[str]
+  def parse(lines):
+    kinds = { "%": Network.FLIPFLOP, "&": Network.CONJUNCTION }
+    modules = {}
+    for l in lines:
+      name, outs = l.split(" -> ")
+      kind = kinds.get(name[0], Network.BROADCAST)
+      modules[name.lstrip("%&")] = (kind, outs.split(", "))
+
+    names = list(modules)
+    # Pulses can go to modules that are never defined, like rx.
+    for _, outs in list(modules.values()):
+      for o in outs:
+        if o not in modules:
+          modules[o] = (Network.OUTPUT, [])
+          names.append(o)
+
+    ids = { n: i for i, n in enumerate(names) }
+    return Network(names,
+        [ modules[n][0] for n in names ],
+        [ tuple(ids[o] for o in modules[n][1]) for n in names ])
+
+  def reset(self):
+    self.flips = 0
+    self.memory = [0] * len(self.names)
+
+  def push(self, watch=0):
+    """Pushes the button once, returns (low pulses, high pulses, fired).
+
+    fired has the bits of the modules in `watch` that sent a high pulse.
+    """
+    kinds, outputs, inputs, memory = self.kinds, self.outputs, self.inputs, self.memory
+    flips = self.flips
+    lo = hi = fired = 0
+    # The button isn't a module, so it's never anyone's input.
+    queue = deque([(-1, self.broadcast, False)])
+    while queue:
+      sender, target, high = queue.popleft()
+      if high:
+        hi += 1
+      else:
+        lo += 1
+
+      kind = kinds[target]
+      bit = 1 << target
+      if kind == Network.FLIPFLOP:
+        if high:
+          # flip flops ignore high pulses.
+          continue
+        flips ^= bit
+        out = flips & bit != 0
+      elif kind == Network.CONJUNCTION:
+        # lo if all their inputs are high, hi otherwise.
+        if high:
+          memory[target] |= 1 << sender
+        else:
+          memory[target] &= ~(1 << sender)
+        out = memory[target] != inputs[target]
+      elif kind == Network.BROADCAST:
+        out = False
+      else:
+        continue
+
+      if out:
+        fired |= bit & watch
+      for o in outputs[target]:
+        queue.append((target, o, out))
+
+    self.flips = flips
+    return (lo, hi, fired)
+
+  def upstream(self, module):
+    """Every module that can send pulses that reach `module`, and itself."""
+    seen = 1 << module
+    process = [module]
+    while process:
+      m = process.pop()
+      inputs = self.inputs[m]
+      while inputs:
+        low = inputs & -inputs
+        inputs ^= low
+        if not seen & low:
+          seen |= low
+          process.append(low.bit_length() - 1)
+    return seen
+
+  def copy(self):
+    """The same modules, with all their state back at the start."""
+    return Network(self.names, self.kinds, self.outputs)
+
+  def only(self, keep):
+    """A fresh copy with just the modules in the `keep` bitset."""
+    kinds = [ k if keep >> i & 1 else Network.OUTPUT for i, k in enumerate(self.kinds) ]
+    outputs = [ tuple(o for o in outs if keep >> o & 1) for outs in self.outputs ]
+    return Network(self.names, kinds, outputs)
+
+  def counters(self, name):
+    """Splits what feeds `name` into counters that run independently.
+
+    `name` has to be fed by one conjunction, whose inputs each have their
+    own piece of the network between them and the broadcaster. Returns
+    (counter, bitset of its piece) for each.
+    """
+    target = self.ids[name]
+    feeders = [ i for i, outs in enumerate(self.outputs) if target in outs ]
+    if len(feeders) != 1 or self.kinds[feeders[0]] != Network.CONJUNCTION:
+      raise Exception(f"{name} isn't fed by a single conjunction")
+
+    shared = 1 << self.broadcast
+    pieces = []
+    taken = 0
+    inputs = self.inputs[feeders[0]]
+    for c in range(len(self.names)):
+      if inputs >> c & 1:
+        piece = self.upstream(c) & ~shared
+        if piece & taken:
+          raise Exception(f"{self.names[c]} shares modules with another counter")
+        taken |= piece
+        pieces.append((c, piece | shared))
+    return pieces
+
+  def period(self, module):
+    """Pushes until `module` sends a high pulse, checks that it repeats."""
+    bit = 1 << module
+    pushes = 0
+    hits = []
+    while len(hits) < 2:
+      pushes += 1
+      if self.push(bit)[2]:
+        hits.append(pushes)
+    first, second = hits
+    if second != 2 * first:
+      raise Exception(f"{self.names[module]} fires at {first} and {second}, not a cycle from 0")
+    return first
 
-  @staticmethod
-  def parse(line):
-    assert line[0] == "&"
-    name, outs = line[1:].split(" -> ")
-    return Conjunction(name, list(), outs.split(", "))
 
 LOAD = "content"
 def REWRITE(lines):
-  items = {}
-  for l in lines:
-    if l[0] == "%":
-      ff = FlipFlop.parse(l)
-      items[ff.name] = ff
-    elif l[0] == "&":
-      c = Conjunction.parse(l)
-      items[c.name] = c
-    else:
-      b = Through.parse(l)
-      items["broadcast"] = b
-
-  keys = list(items.keys())
-  keys.sort()
-  print(keys)
-
-  for i in items.values():
-    for o in i.outputs:
-      if o in items and type(items[o]) == Conjunction:
-        items[o].inputs.append(i.name)
-
-  return items
+  return Network.parse(lines)
+
+def simulate(network, pushes):
+  """(low pulses, high pulses) for each push, kept in plain dicts by name."""
+  names = network.names
+  kinds = { n: network.kinds[i] for i, n in enumerate(names) }
+  outputs = { n: [ names[o] for o in network.outputs[i] ] for i, n in enumerate(names) }
+  on = { n: False for n in names }
+  memory = defaultdict(dict)
+  for n in names:
+    for o in outputs[n]:
+      memory[o][n] = False
+
+  counts = []
+  for _ in range(pushes):
+    lo = hi = 0
+    queue = deque([("button", "broadcaster", False)])
+    while queue:
+      sender, target, high = queue.popleft()
+      if high:
+        hi += 1
+      else:
+        lo += 1
+      kind = kinds[target]
+      if kind == Network.FLIPFLOP:
+        if high:
+          continue
+        on[target] = not on[target]
+        out = on[target]
+      elif kind == Network.CONJUNCTION:
+        memory[target][sender] = high
+        out = not all(memory[target].values())
+      elif kind == Network.BROADCAST:
+        out = high
+      else:
+        continue
+      for o in outputs[target]:
+        queue.append((target, o, out))
+    counts.append((lo, hi))
+  return counts
 
 def TEST(inputs):
-  pass
-
-def pulse(histates, signals, thing, hilo, rxsignals=None):
-  if rxsignals is not None:
-    if (hilo, thing.name) not in rxsignals:
-      rxsignals[(hilo, thing.name)] = 0
-    rxsignals[(hilo, thing.name)] += 1
-
-  if hilo:
-    histates.add(thing.name)
-  else:
-    histates.discard(thing.name)
-
-  for o in thing.outputs:
-    #print("signal", thing.name, f"-{'high' if hilo else 'low'}->", o)
-    signals.append(Signal(o, hilo))
-
-def pushbotton(histates, items, rxsignals=None):
-  lo = 0
-  hi = 0
-  signals = []
-
-  pulse(histates, signals, Through("button", ["broadcast"]), False)
-  
-  while signals:
-    name, hilo = signals.pop(0)
-    #print(">", name, hilo)
-
-    # Do counting.
-    if hilo:
-      hi += 1
-    else:
-      lo += 1
-
-    if name not in items:
-      #print(f"signal to missing item {name}")
-      continue
-
-    thing = items[name]
-    if type(thing) == FlipFlop:
-      if not hilo:
-        # flip flops ignore high pulses.
-        thing.state = not thing.state
-        pulse(histates, signals, thing, thing.state, rxsignals=rxsignals)
-    elif type(thing) == Conjunction:
-      # Conjunctions fire:
-      # * lo if all their inputs are true,
-      # * hi otherwise.
-
-      any_lo = any(map(lambda x: x not in histates, thing.inputs))
-      pulse(histates, signals, thing, any_lo, rxsignals=rxsignals)
-    elif type(thing) == Through:
-      pulse(histates, signals, thing, False, rxsignals=rxsignals)
-
-  return (lo, hi)
+  # Both pulses reach con in the same round: it has to see the first one
+  # before the second is delivered, not both at once.
+  racing = Network.parse([
+    "broadcaster -> b, a",
+    "%b -> con",
+    "%a -> con",
+    "&con -> output",
+  ])
+  for network in (racing, inputs.copy()):
+    expected = simulate(network, 20)
+    assert [ network.push()[:2] for _ in range(20) ] == expected, network.names
 
 def PART1(inputs):
-  # Process
-  print(inputs)
+  # A fresh copy, so pushing the button leaves the parsed network alone.
+  network = inputs.copy()
 
   countlo, counthi = (0, 0)
-  histates = set()
   for i in range(1000):
-    lo, hi = pushbotton(histates, inputs)
-    #print("push", i+1, "lo:", lo, "hi:", hi)
+    lo, hi, _ = network.push()
     countlo += lo
     counthi += hi
 
-  print(countlo, counthi)
   return countlo * counthi
 
 def PART2(inputs):
-  # oops, inputs is stateful...
-  for i in inputs.values():
-    if type(i) == FlipFlop:
-      i.state = False
-
-  # No genealized solution for part two.
-  # need to examine the graph to find subcomponents.
-  # dump this into dot to visualize it.
-  #
-  # print("digraph mystuff {")
-  # for i in inputs.values():
-  #   #print(i.name, ">", ", ".join(i.outputs))
-  #   for o in i.outputs:
-  #     print(" ", i.name, "-->", o, ";")
-  # print("}")
-
-  # Subcomponents: 
-  # * nn -> br
-  # * lz -> lf
-  # * tx -> fk
-  # * mj -> rz
-  # These feed into lb -> rx
-  # lb is a conjunction, requires all inputs lo to fire rx.
-  # br, lf, fk, rz are also conjunction, but with a single input
-
-  # So we need to calculate the cycle size for each of the subcomponents.
-  # We're looking for when each of the subcomponent ends recieves a hi pulse.
-
-  check = ["br", "lf", "fk", "rz"]
+  network = inputs
+  # rx gets a low pulse when the conjunction in front of it has seen high
+  # pulses from all its inputs at once. Each input is the end of its own
+  # counter, running apart from the rest of the network (see graph.png),
+  # so each gets simulated alone to find how often it fires.
   cycles = {}
-
-  histates = set()
-
-  pushes = 0
-  while True:
-    pushes += 1
-
-    signals = {}
-    pushbotton(histates, inputs, rxsignals=signals)
-
-    if "rx" in signals and signals["rx"] == 1:
-      print("oh no, brute force")
-      return pushes
-
-    for c in check:
-      if signals.get((True, c), 0) == 1 and c not in cycles:
-        print(f"{c} @ {pushes}")
-        cycles[c] = pushes
-
-    if len(cycles) == len(check):
-      break
+  for counter, piece in network.counters("rx"):
+    cycles[network.names[counter]] = network.only(piece).period(counter)
 
   # Attempt 1: 1. Wtf, that can't be right. - it is not.
   # Okay, it's exactly 1 low pulse to rx.
   # Attempt 2: 250924073918341 - yes!
   # And once again, AOC only needs simple cycle handling. phew.
-  #print(cycles)
   return math.lcm(*cycles.values())
-
-  # Brute force solution, won't work.
-  tries = 0
-  signals = {}
-  histates = set()
-  while True:
-    tries += 1
-    signals = [0]
-    pushbotton(histates, inputs, rxsignals=signals)
-    if signals[0] == 1:
-      break
-
-  return tries
-
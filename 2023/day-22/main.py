@@ -57,34 +57,6 @@ class Brick(NamedTuple):
       c += 1
     return c >= 2
 
-@dataclass
-class Mask:
-  occupied: dict = field(default_factory=dict)
-
-  def add(self, brick):
-    for x in range(brick.start.x, brick.end.x + 1):
-      for y in range(brick.start.y, brick.end.y + 1):
-        self.occupied[(x, y)] = brick
-
-  def intersect(self, brick: Brick) -> bool:
-    assert type(brick) == Brick
-    for x in range(brick.start.x, brick.end.x + 1):
-      for y in range(brick.start.y, brick.end.y + 1):
-        p = (x, y)
-        if p in self.occupied:
-          return True
-    return False
-
-  def getintersects(self, brick: Brick) -> bool:
-    assert type(brick) == Brick
-    hit = set()
-    for x in range(brick.start.x, brick.end.x + 1):
-      for y in range(brick.start.y, brick.end.y + 1):
-        p = (x, y)
-        if p in self.occupied:
-          hit.add(self.occupied[p])
-    return hit
-
 def intersect(b1, b2):
   def i(b1, b2, attr):
     return ((getattr(b1.start, attr) <= getattr(b2.start, attr) and getattr(b2.start, attr) <= getattr(b1.end, attr))
@@ -102,119 +74,121 @@ def REWRITE(lines):
   #print(len(bricks))
   return bricks
 
-def drop_bricks(bricks):
-  minX = min(map(lambda b: b.end.x, bricks))
-  minY = min(map(lambda b: b.end.y, bricks))
-  maxX = max(map(lambda b: b.end.x, bricks))
-  maxY = max(map(lambda b: b.end.y, bricks))
-  #print(minX, maxX)
-  #print(minY, maxY)
-
-  # We want to create a mask for each Z index to quickly check intersect.
-  FLOOR_GUARD = object()
-  floor = Mask({(x, y): FLOOR_GUARD for x in range(minX, maxX + 1) for y in range(minY, maxY + 1)})
+def settle(bricks):
+  """Drops every brick as far as it goes, lowest first.
 
-  masks = defaultdict(Mask)
-  masks[0] = floor
-  highestZ = 0
+  Returns the settled bricks, lowest first, and for each one the indexes
+  of the bricks right under it (-1 being the floor).
+  """
+  width = max(b.end.y for b in bricks) + 1
+  cells = (max(b.end.x for b in bricks) + 1) * width
+  # Top of the pile over each (x, y), and which brick that is.
+  height = [0] * cells
+  top = [-1] * cells
 
-  # list of bricks with updated positions.
   done = []
-
-  # index of parent bricks
-  parents = {}
-  children = defaultdict(set)
-
-  while bricks:
-    dropped = bricks.pop(0)
-
-    # Bricks auto drop to one above the highest Z we've ever dropped.
-    currZ = highestZ + 1
-    while not masks[currZ].intersect(dropped):
-      currZ -= 1
-
-    # There is an intersect here.
-    hit = masks[currZ].getintersects(dropped)
-    fell = dropped.drop(currZ + 1)
+  supports = []
+  for b in sorted(bricks, key=lambda b: b.start.z):
+    footprint = [ x * width + y
+        for x in range(b.start.x, b.end.x + 1)
+        for y in range(b.start.y, b.end.y + 1) ]
+    z = max(height[c] for c in footprint)
+    fell = b.drop(z + 1)
+    supports.append({ top[c] for c in footprint if height[c] == z })
+    for c in footprint:
+      height[c] = fell.end.z
+      top[c] = len(done)
     done.append(fell)
-    highestZ = max(highestZ, fell.end.z)
-
-    for z in range(fell.start.z, fell.end.z + 1):
-      masks[z].add(fell)
 
-    parents[fell] = hit
-    for parent in hit:
-      children[parent].add(fell)
-
-  print("all bricks dropped")
-  return (done, parents, children)
+  return (done, supports)
+
+def dominators(supports):
+  """Dominator tree of the support graph, rooted at the floor.
+
+  A brick dominates another when every chain of support from the floor up
+  to it goes through that brick, so removing it makes the other fall.
+  Bricks come lowest first, so everything under a brick is already in the
+  tree, and its immediate dominator is the lowest common ancestor of the
+  bricks right under it. Node 0 is the floor, brick i is node i + 1.
+
+  Returns (idom, depth) for every node.
+  """
+  n = len(supports) + 1
+  idom = [0] * n
+  depth = [0] * n
+  # up[k][v] is v's 2**k-th ancestor.
+  up = [ [0] * n for _ in range(max(1, n.bit_length())) ]
+
+  def lca(a, b):
+    if depth[a] < depth[b]:
+      a, b = b, a
+    diff = depth[a] - depth[b]
+    k = 0
+    while diff:
+      if diff & 1:
+        a = up[k][a]
+      diff >>= 1
+      k += 1
+    if a == b:
+      return a
+    for k in range(len(up) - 1, -1, -1):
+      if up[k][a] != up[k][b]:
+        a, b = up[k][a], up[k][b]
+    return up[0][a]
+
+  for v in range(1, n):
+    under = iter(supports[v - 1])
+    d = next(under) + 1
+    for u in under:
+      d = lca(d, u + 1)
+    idom[v] = d
+    depth[v] = depth[d] + 1
+    up[0][v] = d
+    for k in range(1, len(up)):
+      up[k][v] = up[k - 1][up[k - 1][v]]
+
+  return (idom, depth)
+
+def falls(brick, supports):
+  """Bricks that fall if `brick` is taken out, the slow way."""
+  falling = set([brick])
+  for i in range(brick + 1, len(supports)):
+    if supports[i] <= falling:
+      falling.add(i)
+  return len(falling) - 1
+
+def dominated(idom, v, u):
+  while u:
+    u = idom[u]
+    if u == v:
+      return True
+  return False
 
 def TEST(inputs):
-  pass
+  # The dominator tree against dropping every brick by hand. That's
+  # quadratic, so big piles only check their lowest bricks, which settle
+  # the same without the rest on top.
+  done, supports = settle(inputs[:150])
+  idom, depth = dominators(supports)
+  below = [ sum(1 for u in range(1, len(idom)) if dominated(idom, v + 1, u)) for v in range(len(done)) ]
+  assert below == [ falls(v, supports) for v in range(len(done)) ]
 
 def PART1(inputs):
-  #print("".join([str(b) for b in inputs]))
-  bricks = list(inputs)
-
-  done, parents, children = drop_bricks(bricks)
+  done, supports = settle(inputs)
+  idom, _ = dominators(supports)
 
-  s = 0
-  for brick in done:
-    safe = True
-    for c in children[brick]:
-      if len(parents[c]) == 1:
-        safe = False
-        break
-    if safe:
-      s += 1
-  return s
-
-
-def chain_drop(brick, parents, children):
-  # small hack to handle the brick case.
-  falling = set([brick])
-  seen = set()
-
-  processing = set()
-  processing.add(brick)
-
-  # BFS feels like overkill, but we have to handle an entire
-  # z layer before moving on to the next one.
-
-  process = [brick]
-  while process:
-    candidate = process.pop(0)
-    processing.remove(candidate)
-    seen.add(candidate)
-
-    cParents = parents[candidate]
-    if candidate not in falling and not falling.issuperset(cParents):
-      continue
-
-    falling.add(candidate)
-
-    cChildren = children[candidate]
-    sort = False
-    for c in cChildren:
-      if c in seen:
-        continue
-      if c not in processing:
-        processing.add(c)
-        process.append(c)
-        sort = True
-    if sort:
-      process.sort(key=lambda b: b.end.z)
-
-  # Undo the hack from above.
-  falling.remove(brick)
-  return falling
+  # Bricks that hold nothing up alone are dominating nothing, and any brick
+  # dominating something is the only support of something.
+  holding = set(idom[1:])
+  return sum(1 for v in range(1, len(idom)) if v not in holding)
 
 def PART2(inputs):
-  bricks = list(inputs)
-  done, parents, children = drop_bricks(bricks)
+  done, supports = settle(inputs)
+  _, depth = dominators(supports)
 
-  drops = [chain_drop(brick, parents, children) for brick in done]
+  # Each brick falls when any brick between it and the floor in the tree is
+  # taken out, and the depth counts those (and the floor).
   # Attempt 1: 1249 - too low
   # misread question, sum of drops, not biggest drop.
   # Attempt 2: 67468 - correct
-  return sum(map(len, drops))
+  return sum(d - 1 for d in depth[1:])
@@ -5,7 +5,9 @@ from dataclasses import dataclass
 from typing import NamedTuple
 from _.data.formatting.blocks import Block
 from _.data.structures.point import Point
-from _.games.advent_of_code.utils import read_numbers
+from _.games.advent_of_code.utils import read_numbers, can_pool
+
+import multiprocessing
 
 DIRECTIONS = {
   # Row, column - (0,0) in the top-left.
@@ -32,8 +34,41 @@ def REWRITE(lines):
   grid[Point(size[0], size[1] - 2)] = "#"
   return (size, grid)
 
+def walk_all(size, grid, slippery):
+  """Longest hike found by trying every walk over the grid, one step at a time."""
+  start = Point(0, 1)
+  end = Point(size[0] - 1, size[1] - 2)
+  seen = set([start])
+  best = -1
+
+  def walk(pos, steps):
+    nonlocal best
+    if pos == end:
+      best = max(best, steps)
+      return
+    for n in adjacent(grid, pos):
+      if n in seen:
+        continue
+      if slippery and grid[pos] != "." and pos + DIRECTIONS[grid[pos]] != n:
+        continue
+      seen.add(n)
+      walk(n, steps + 1)
+      seen.remove(n)
+
+  walk(start, 0)
+  return best
+
 def TEST(inputs):
-  pass
+  # The pruned search, on its own and split over a pool, against trying
+  # every walk. That's exponential, so only small grids get checked.
+  size, grid = inputs
+  if size[0] * size[1] > 30 * 30:
+    return
+  for slippery in (True, False):
+    graph = LongestPath.from_grid(size, grid, slippery)
+    alone = graph.solve(jobs=1)
+    assert alone == graph.solve(), slippery
+    assert alone == walk_all(size, grid, slippery), slippery
 
 def adjacent(grid, pos):
   items = []
@@ -43,189 +78,160 @@ def adjacent(grid, pos):
       items.append(n)
   return items
 
-def dfs(grid, node, end, seen):
-  if node == end:
-    return 0
-
-  assert node not in seen, f"found {node} in {seen}"
-  seen.add(node)
-
-  options = None
-  if grid[node] == ".":
-    options = adjacent(grid, node)
-  else:
-    n = node + DIRECTIONS[grid[node]]
-    options = [n]
-
-  mPath = 0
-  for o in options:
-    if o in seen:
-      continue
-    mPath = max(mPath, dfs(grid, o, end, seen))
-
-  seen.remove(node)
-  return mPath + 1
-
-
 def PART1(inputs):
   size, grid = inputs
+  # Slopes only go one way.
+  return LongestPath.from_grid(size, grid, slippery=True).solve(jobs=1)
+
+def trails(size, grid, slippery):
+  """The trails between junctions: junction -> junction -> steps.
 
+  With `slippery` set, a slope can only be left downhill, so trails that
+  go uphill are left out.
+  """
   start = Point(0, 1)
   end = Point(size[0] - 1, size[1] - 2)
+  junctions = set([start, end])
+  for pos, value in grid.items():
+    if value != "#" and len(adjacent(grid, pos)) > 2:
+      junctions.add(pos)
+
+  def allowed(pos, n):
+    return not slippery or grid[pos] == "." or pos + DIRECTIONS[grid[pos]] == n
+
+  edges = defaultdict(dict)
+  for j in junctions:
+    for n in adjacent(grid, j):
+      prev, pos, steps = j, n, 1
+      ok = allowed(j, n)
+      while ok and pos not in junctions:
+        options = [ o for o in adjacent(grid, pos) if o != prev ]
+        if not options:
+          # Dead end.
+          ok = False
+          break
+        nxt, = options
+        ok = allowed(pos, nxt)
+        prev, pos, steps = pos, nxt, steps + 1
+      if ok:
+        edges[j][pos] = max(steps, edges[j].get(pos, 0))
+
+  return start, end, edges
+
+
+class LongestPath:
+  """Longest simple path from node 0 to node `end` over a small graph.
+
+  Nodes are numbered so a path's visited nodes fit in one int. The search
+  gives up on any path that couldn't beat the best so far even if it went
+  on to enter every node it hasn't visited over that node's longest edge.
+  """
+  def __init__(self, count, edges, end):
+    # edges: node -> [(next, steps)]
+    into = [ (a, c) for a in range(count) for b, c in edges[a] if b == end ]
+    self.bonus = 0
+    if len(into) == 1 and into[0][0] != 0:
+      # Once at the only way into the end, the end is the only place to go.
+      end, self.bonus = into[0]
+    self.end = end
+    self.edges = [ [ (b, 1 << b, c) for b, c in edges[a] ] if a != end else []
+        for a in range(count) ]
+
+    # The most entering any node can add to a path.
+    self.most = [0] * count
+    for a in range(count):
+      for b, _, c in self.edges[a]:
+        if b != 0:
+          self.most[b] = max(self.most[b], c)
+    self.upper = sum(self.most)
+
+  @staticmethod
+  def from_grid(size, grid, slippery):
+    start, end, edges = trails(size, grid, slippery)
+    order = [start] + sorted(n for n in edges if n != start) + [ n for n in [end] if n not in edges ]
+    index = { n: i for i, n in enumerate(order) }
+    numbered = [ [ (index[b], c) for b, c in edges.get(a, {}).items() ] for a in order ]
+    return LongestPath(len(order), numbered, index[end])
+
+  def search(self, node, seen, steps, rest, best=-1):
+    """Longest way to the end from `node`, None if it can't beat `best`.
+
+    `seen` has a bit set for each node already on the path, and `rest`
+    is the most the nodes not on it could still add.
+    """
+    edges, most, end = self.edges, self.most, self.end
+    found = best
+
+    def walk(node, seen, steps, rest):
+      nonlocal found
+      if node == end:
+        if steps > found:
+          found = steps
+        return
+      if steps + rest <= found:
+        return
+      for n, bit, c in edges[node]:
+        if not seen & bit:
+          walk(n, seen | bit, steps + c, rest - most[n])
+
+    walk(node, seen, steps, rest)
+    if found == best:
+      return None
+    return found + self.bonus
+
+  def prefixes(self, wanted):
+    """Splits the search into at least `wanted` partial paths, if it can."""
+    paths = [ (0, 1, 0, self.upper) ]
+    while len(paths) < wanted:
+      longer = []
+      for node, seen, steps, rest in paths:
+        if node == self.end:
+          longer.append((node, seen, steps, rest))
+          continue
+        for n, bit, c in self.edges[node]:
+          if not seen & bit:
+            longer.append((n, seen | bit, steps + c, rest - self.most[n]))
+      if len(longer) == len(paths):
+        break
+      paths = longer
+    return paths
+
+  def solve(self, jobs=None):
+    if not can_pool(jobs):
+      return self.search(0, 1, 0, self.upper)
+
+    best = multiprocessing.Value("q", -1)
+    tasks = self.prefixes((jobs or multiprocessing.cpu_count()) * 16)
+    with multiprocessing.Pool(jobs, _init_worker, (self, best)) as pool:
+      results = list(pool.imap_unordered(_search_prefix, tasks))
+    found = [ r for r in results if r is not None ]
+    return max(found) if found else None
+
+
+# Each worker gets the graph, and the shared best length to prune with,
+# once when it starts rather than with every prefix.
+_graph = None
+_best = None
+
+def _init_worker(graph, best):
+  global _graph, _best
+  _graph = graph
+  _best = best
+
+
+def _search_prefix(task):
+  node, seen, steps, rest = task
+  # Anything another worker has already found is a floor to prune against.
+  found = _graph.search(node, seen, steps, rest, _best.value - _graph.bonus)
+  if found is not None:
+    with _best.get_lock():
+      _best.value = max(_best.value, found)
+  return found
 
-  import sys
-  sys.setrecursionlimit(1000 + size[0] * size[1])
-  return dfs(grid, start, end, set())
-
-def segment_compress(grid):
-  # Collapse long runs of single options into a larger weight.
-
-  # Point -> Point -> cost
-  # Cost to go from point A to point B.
-  costed = defaultdict(dict)
-
-  # Create an initial cost map, all moves have cost 1.
-  for pos in grid:
-    if grid_rock(grid, pos):
-      continue
-    for n in adjacent(grid, pos):
-      costed[pos][n] = 1
-
-  for node, neighbours in costed.items():
-    for n in neighbours:
-      assert costed[n][node] == 1
-      assert costed[node][n] == 1
-
-  #print(costed)
-
-  process = set(costed.keys())
-  while process:
-    # Pick a random point in the grid we haven't seen.
-    # It's in a collapsible segment if it only has 2 neighbours.
-    # The segment ends when one of the ends has more than two neighbours.
-    node = process.pop()
-
-    neighbours = costed[node]
-    if len(neighbours) != 2:
-      continue
-
-    n1, n2 = neighbours
-    # This could also be used to handle ice rules, if you make those
-    # special nodes that must also be kept (ie: they can't be collapsed
-    # into a segment).
-    #> if grid[n1] != "." or grid[n2] != "." or grid[node] != ".":
-    #>   continue
-    costed[n1][n2] = costed[n1][node] + costed[node][n2]
-    costed[n2][n1] = costed[n2][node] + costed[node][n1]
-    del costed[n1][node]
-    del costed[n2][node]
-    del costed[node]
-
-  for node in costed:
-    for n in costed[node]:
-      assert costed[n][node] == costed[node][n]
-      assert node != n
-
-  #print(costed)
-  return costed
-
-def bfs(compressed, start, end):
-  # BFS won't work because of the cycles in the graph.
-  seen = set()
-  process = [start]
-  processing = set(process)
-
-  distances = {}
-  distances[start] = 0
-
-  while process:
-    #print([(p, distances[p]) for p in process])
-    node = process.pop(0)
-    processing.remove(node)
-    seen.add(node)
-
-    if node == end:
-      return distances[end]
-
-    options = set(compressed[node].keys())
-    sort = False
-    for o in options:
-      if o in seen:
-        continue
-      travel_cost = distances[node] + compressed[node][o]
-      distances[o] = max(distances.get(o, 0), travel_cost)
-      if o not in processing:
-        processing.add(o)
-        process.append(o)
-        sort = True
-    if sort:
-      process.sort(key=lambda n: distances[n], reverse=True)
-
-def compress_dfs(grid, compressed, node, end, seen):
-  if node == end:
-    # Note that only successful paths have the array, all others
-    # only pass around None values. 
-    return (0, [end])
-
-  assert node not in seen, f"found {node} in {seen}"
-  seen.add(node)
-
-  mCost = 0
-  mPath = None
-  options = compressed[node]
-  # If we wanted to process Slippery Ice rules we could do so.
-  # So long as the cost matrix was correctly generated for it.
-  #> if grid[node] != ".":
-  #>   options = [node + DIRECTIONS[grid[node]]]
-  for o in options:
-    if o in seen:
-      continue
-    cost, path = compress_dfs(grid, compressed, o, end, seen)
-    # Need to make sure this makes it to the end, not just that it's a long path.
-    if not path:
-      continue
-    if mCost < compressed[node][o] + cost:
-      mCost = compressed[node][o] + cost
-      mPath = path
-
-  seen.remove(node)
-  # Only successful paths get the overhead of array manipulation.
-  # It could be converted to a boolean...
-  if mPath:
-    mPath.append(node)
-  return (mCost, mPath)
 
 def PART2(inputs):
   size, grid = inputs
 
-  start = Point(0, 1)
-  end = Point(size[0] - 1, size[1] - 2)
-
-  compressed = segment_compress(grid)
-  print("decision points:", len(compressed))
-  for c in compressed:
-    #print(c, compressed[c])
-    #print(c)
-    pass
-
-  # Find the intersections...
-  # intersection finding won't correctly see the start & end.
-  # But they are in the segment_compressed output.
-  intersections = set([start, end])
-  for row in range(size[0]):
-    for col in range(size[1]):
-      p = Point(row, col)
-      if grid_rock(grid, p):
-        continue
-      if len(adjacent(grid, p)) > 2:
-        intersections.add(p)
-        #print(">", p)
-
-  for c in compressed:
-    assert c in intersections
-    intersections.discard(c)
-  assert len(intersections) == 0
-
   # Attempt 1: 2946 - too low
   # Switch to exhaustive depth first search.
   # Attempt 2: 6921 - too high
@@ -233,4 +239,4 @@ def PART2(inputs):
   # It does, and it gives the same answer as part1 does. :|
   # Change DFS to actually check it successfully made it to the end, not
   # just that it took a really long walk.
-  return compress_dfs(grid, compressed, start, end, set())
+  return LongestPath.from_grid(size, grid, slippery=False).solve()
@@ -5,7 +5,10 @@ from dataclasses import dataclass
 from typing import NamedTuple
 from _.data.formatting.blocks import Block
 from _.games.advent_of_code.utils import read_numbers
+from _.games.advent_of_code.betweenness import edge_betweenness
 
+import array
+import heapq
 import random
 
 LOAD = "content"
@@ -20,291 +23,226 @@ def REWRITE(lines):
   return graph
 
 def TEST(inputs):
-  pass
-
-def connected_components(graph, removed=set()):
-  nodes = set(graph.keys())
-  components = []
-  while nodes:
-    processing = set([nodes.pop()])
-    component = set()
-    while processing:
-      p = processing.pop()
-      nodes.discard(p)
-      component.add(p)
-
-      for a in graph[p]:
-        if (p, a) in removed or (a, p) in removed:
-          continue
-        if a in nodes:
-          processing.add(a)
-
-    components.append(component)
-
-  return components
-
-# Finding and removing cliques was the first thing I could think of.
-# In a highly connected graph, it could have compressed it a whole bunch.
-#
-# defn: Clique - a group of nodes in a graph, that are all connected to each other.
-def cliques(graph):
-  process = set(graph.keys())
-  clique = []
-  while process:
-    n = process.pop()
-    protoclique = set([n])
-    for e in graph[n]:
-      if n in graph[e] and e in process:
-        protoclique.add(e)
-        process.remove(e)
-    clique.append(protoclique)
-
-  for idx, c1 in enumerate(clique):
-    for c2 in clique[idx + 1:]:
-      assert c1.isdisjoint(c2)
-
-  return clique
-
-# This compresses cliques in a graph, by picking a random representative,
-# and then remapping all the edges to the random representative.
-#
-# This is actually bad for things like kargers, because it increases the
-# probability that the min-cut edges get randomly chosen, since it removes
-# a lot of the non-min-cut edges that are part of cliques.
-def compress_cliques(graph):
-  newGraph = defaultdict(set)
-  nodeMap = {}
-  repIndex = {}
-  cliqs = cliques(graph)
-  for cliq in cliqs:
-    rep = next(iter(cliq))
-    nodeMap[rep] = cliq
-    for c in cliq:
-      repIndex[c] = rep
-
-  for node in graph:
-    r1 = repIndex[node]
-    for e in graph[node]:
-      r2 = repIndex[e]
-      if r1 == r2:
+  graph = Graph.from_dict(inputs)
+  found = cut_of_size(graph, 3)
+  assert found is not None, "no 3 wires split the graph in two"
+  cut, side = found
+
+  # Sampling centrality and the exact minimum cut are both too slow to run
+  # on the whole input.
+  if len(graph) > 100:
+    return
+
+  # The cut wires are also the ones most shortest paths have to cross.
+  central = centrality(graph, top=len(cut))[:len(cut)]
+  assert set(a >> 1 for a in central) == set(a >> 1 for a in cut)
+
+  # The pool adds up the same batches in the same order as a single pass.
+  offsets, targets, edges = graph.csr()
+  count = len(graph.to) // 2
+  assert (edge_betweenness(offsets, targets, edges, count, jobs=1)
+      == edge_betweenness(offsets, targets, edges, count, jobs=2, serial=0))
+
+  # The flow cut against the exact minimum cut.
+  weight, nodes = stoer_wagner(graph)
+  assert len(cut) == weight
+  assert len(nodes) in (sum(side), len(graph) - sum(side))
+
+class Graph:
+  """The graph relabeled to ints, edges stored as pairs of arcs.
+
+  Edge i is arc 2i one way and arc 2i + 1 back, so a ^ 1 is the arc
+  going the other way. adj[n] has the arcs leaving node n, and to[a] is
+  where arc a goes.
+  """
+  def __init__(self, names, edges):
+    self.names = names
+    self.to = []
+    self.adj = [ [] for _ in names ]
+    for u, v in edges:
+      self.adj[u].append(len(self.to))
+      self.to.append(v)
+      self.adj[v].append(len(self.to))
+      self.to.append(u)
+
+  @staticmethod
+  def from_dict(graph):
+    names = sorted(graph)
+    index = { n: i for i, n in enumerate(names) }
+    edges = [ (index[a], index[b]) for a in names for b in graph[a] if a < b ]
+    return Graph(names, edges)
+
+  def __len__(self):
+    return len(self.names)
+
+  def csr(self):
+    """(offsets, targets, edges) arrays, for betweenness."""
+    offsets = array.array("i", [0])
+    targets = array.array("i")
+    edges = array.array("i")
+    for arcs in self.adj:
+      for a in arcs:
+        targets.append(self.to[a])
+        edges.append(a >> 1)
+      offsets.append(len(targets))
+    return (offsets, targets, edges)
+
+  def edge(self, arc):
+    return (self.names[self.to[arc ^ 1]], self.names[self.to[arc]])
+
+  def distances(self, starts):
+    dist = [-1] * len(self)
+    for s in starts:
+      dist[s] = 0
+    process = list(starts)
+    for n in process:
+      for a in self.adj[n]:
+        m = self.to[a]
+        if dist[m] < 0:
+          dist[m] = dist[n] + 1
+          process.append(m)
+    return dist
+
+
+def max_flow(graph, sources, sink, limit):
+  """Edmonds-Karp with every edge carrying 1 either way.
+
+  Stops once `limit` paths are found, returning (limit, None). Otherwise
+  returns (flow, side), where side marks what the sources still reach:
+  one side of a minimum cut.
+  """
+  to, adj = graph.to, graph.adj
+  # flow[a] == -flow[a ^ 1], an arc is usable while its flow is under 1.
+  flow = [0] * len(to)
+  total = 0
+  while total < limit:
+    via = [-1] * len(graph)
+    for s in sources:
+      via[s] = -2
+    process = list(sources)
+    for n in process:
+      if n == sink:
+        break
+      for a in adj[n]:
+        m = to[a]
+        if via[m] == -1 and flow[a] < 1:
+          via[m] = a
+          process.append(m)
+
+    if via[sink] == -1:
+      return (total, [ v != -1 for v in via ])
+
+    total += 1
+    n = sink
+    while via[n] != -2:
+      a = via[n]
+      flow[a] += 1
+      flow[a ^ 1] -= 1
+      n = to[a ^ 1]
+
+  return (total, None)
+
+
+def cut_of_size(graph, size):
+  """Splits the graph in two by cutting at most `size` edges.
+
+  Starts with node 0 as the source, and first tries the sink furthest from
+  it, the likeliest to be on the other side. A sink that still takes
+  `size + 1` paths can't be cut off from the source, so it joins the
+  sources. After that sinks are picked at random (from a fixed seed):
+  with a long thin side the furthest node keeps being on the source's
+  side, but a random one is on the other side as often as that side is
+  big. Returns (cut arcs, side), or None if no such cut exists.
+  """
+  dist = graph.distances([0])
+  # Nodes the source can't reach at all are the furthest.
+  first = max(range(len(graph)), key=lambda n: dist[n] if dist[n] >= 0 else len(graph))
+  rest = [ n for n in range(1, len(graph)) if n != first ]
+  random.Random(len(graph)).shuffle(rest)
+
+  sources = [0]
+  for sink in [first] + rest:
+    flow, side = max_flow(graph, sources, sink, size + 1)
+    if flow <= size:
+      cut = [ a for n in range(len(graph)) if side[n]
+          for a in graph.adj[n] if not side[graph.to[a]] ]
+      return (cut, side)
+    sources.append(sink)
+  return None
+
+
+def stoer_wagner(graph):
+  """Minimum cut of the whole graph, returns (weight, nodes on one side).
+
+  Each phase adds nodes in order of how strongly they're tied to the ones
+  already added, then the last node's tie is a cut, and it gets merged
+  into the one before it. O(V E log V), so for checking rather than speed.
+  """
+  weights = [ defaultdict(int) for _ in range(len(graph)) ]
+  for n in range(len(graph)):
+    for a in graph.adj[n]:
+      weights[n][graph.to[a]] += 1
+  members = [ [n] for n in range(len(graph)) ]
+  alive = set(range(len(graph)))
+
+  best = (None, None)
+  while len(alive) > 1:
+    start = next(iter(alive))
+    tie = { start: 0 }
+    added = set()
+    heap = [(0, start)]
+    order = []
+    while heap:
+      w, n = heapq.heappop(heap)
+      if n in added:
         continue
-      newGraph[r1].add(r2)
-      newGraph[r2].add(r1)
-
-  return newGraph, nodeMap
-
-# Simple / naive edge cutting checks.
-# Generates all the edges, and then goes through them one at a time. TT_TT
-# Very slow O(E^3)
-def edge_cutting(graph):
-  edges = set()
-  for node in graph:
-    for e in graph[node]:
-      if (e, node,) not in edges:
-        edges.add((node, e,))
-  #print("edges", len(edges))
-  edges = list(edges)
-
-  # This is the key! The graphs given as part of the problem are
-  # highly connected, and so running a centrality computation first
-  # makes it much easier to find where to cut in the graph.
-  central = centrality(graph)
-  def edge_weight(e):
-    n1, n2 = e
-    return central[n1] + central[n2]
-  edges.sort(key=edge_weight, reverse=True)
-
-  for i, e1 in enumerate(edges):
-    print(f"{i}", len(edges) - i)
-    for j, e2 in enumerate(edges[i+1:]):
-      for k, e3 in enumerate(edges[i+j+2:]):
-        remove = set([e1, e2, e3])
-        components = connected_components(graph, remove)
-        if len(components) == 2:
-          return ((e1, e2, e3), components)
-
-  return False
-
-def kargers(graph, target=100):
-  # Implementation of kargers algorithm. Doesn't really seem
-  # to work well... Did i do it wrong?
-  # https://en.wikipedia.org/wiki/Karger%27s_algorithm
-  multigraph = defaultdict(lambda: defaultdict(int))
-
-  # Convert to multigraph.
-  for node in graph:
-    for e in graph[node]:
-      multigraph[node][e] = 1
-      multigraph[e][node] = 1
-
-  def edgeCount():
-    count = 0
-    for node in multigraph:
-      for e in multigraph[node]:
-        count += multigraph[node][e]
-    return count
-
-  def randEdge():
-    count = edgeCount()
-    if count == 0:
-      return (None, None)
-    r = random.randint(0, count - 1)
-
-    for node in multigraph:
-      for e in multigraph[node]:
-        if r <= multigraph[node][e]:
-          return (node, e)
-        r -= multigraph[node][e]
-
-    assert False, f"rand should have been generated in range..."
-
-  # Oh no, this is really low... :S
-  print("kargers probability:", target**2 / edgeCount()**2 )
-
-  while len(multigraph) > target:
-    (n1, n2) = randEdge()
-
-    # Do a thing to get consistent naming.
-    if n2 < n1:
-      n1, n2 = n2, n1
-    assert n1 is not None
-    assert n2 is not None
-    assert n1 != n2
-
-    # Is this edge handling right?
-    #multigraph[n1][n2] -= 1
-    #multigraph[n2][n1] -= 1
-    #if multigraph[n1][n2] > 0:
-    #  continue
-
-    del multigraph[n1][n2]
-    del multigraph[n2][n1]
-
-    # This lets us retrieve the joined nodes later. :)
-    composite = f"{n1}-{n2}"
-
-    n1edges = set(multigraph[n1].keys())
-    for e1 in n1edges:
-      multigraph[composite][e1] += multigraph[n1][e1]
-      multigraph[e1][composite] += multigraph[n1][e1]
-      del multigraph[e1][n1]
-    del multigraph[n1]
-
-    n2edges = set(multigraph[n2].keys())
-    for e2 in n2edges:
-      multigraph[composite][e2] += multigraph[n2][e2]
-      multigraph[e2][composite] += multigraph[n2][e2]
-      del multigraph[e2][n2]
-    del multigraph[n2]
-
-  return multigraph
-
-def bfs_path(graph, start, end):
-  seen = set()
-  # Track the minimum distance from the start,
-  # and which node we need to visit to take the min path.
-  mindist = defaultdict(lambda: float("inf"))
-  mindist[start] = 0
-  distfrom = {start: start}
-  process = [start]
-  processing = set(process)
-  while process:
-    p = process.pop(0)
-    processing.remove(p)
-    seen.add(p)
-
-    assert p in mindist
-    assert p in distfrom
-    if p == end:
-      break
-
-    for e in graph[p]:
-      if mindist[e] > mindist[p] + 1:
-        mindist[e] = mindist[p] + 1
-        distfrom[e] = p
-      if e in seen or e in processing:
-        continue
-      process.append(e)
-      processing.add(e)
-
-    process.sort(key=lambda n: mindist[n])
-
-  # Connect graph, guaranteed to have a path.
-  assert mindist[end] < float("inf")
-
-  path = []
-  node = end
-  while node != start:
-    path.append(node)
-    node = distfrom[node]
-
-  path.append(start)
-  path.reverse()
-  return path
-
-def centrality(graph, count=1000):
-  # Node -> int
-  weights = defaultdict(int)
-
-  # BFS shortest path for two random nodes in the graph.
-  # We assume the graph given to us might be nice with it's centrality.
-
-  nodes = list(graph.keys())
-
-  for _ in range(count):
-    n1 = random.choice(nodes)
-    n2 = random.choice(nodes)
-    if n1 == n2:
-      continue
-
-    path = bfs_path(graph, n1, n2)
-
-    for n in path[1:-1]:
-      weights[n] += 1
-
-  return weights
+      added.add(n)
+      order.append((n, -w))
+      for m, c in weights[n].items():
+        if m not in added:
+          tie[m] = tie.get(m, 0) + c
+          heapq.heappush(heap, (-tie[m], m))
+
+    (s, _), (t, cut) = order[-2], order[-1]
+    if best[0] is None or cut < best[0]:
+      best = (cut, list(members[t]))
+
+    # Merge t into s.
+    members[s].extend(members[t])
+    for m, c in weights[t].items():
+      if m != s:
+        weights[s][m] += c
+        weights[m][s] += c
+      del weights[m][t]
+    weights[t].clear()
+    alive.discard(t)
+
+  return best
+
+def centrality(graph, top=3, jobs=None):
+  """Edges (as arcs) by how many shortest paths cross them, most first.
+
+  Sampled until the `top` most crossed stop changing.
+  """
+  offsets, targets, edges = graph.csr()
+  scores, _ = edge_betweenness(offsets, targets, edges, len(graph.to) // 2,
+      top=top, jobs=jobs)
+  return [ 2 * e for e in sorted(range(len(scores)), key=scores.__getitem__, reverse=True) ]
 
 def PART1(inputs):
-  #print(inputs)
-  #print(len(connected_components(inputs)))  
-
-  # This is probably easier to visualize to find the edges.
-  #print("graph mygraph {")
-  #for node in inputs:
-  #  print(f"  {node};")
-  #  for e in inputs[node]:
-  #    print(f"  {node} -- {e};")
-  #print("}")
-  # Dot did not like the graph. probably too much interconnectedness. :(
-
-  #compressed, index = compress_cliques(inputs)
-  #print("compressed size:", len(compressed), "vs", len(inputs))
-  #print("compressed edges:", sum([len(edges) for edges in compressed.values()]), 
-  #    "vs", sum([len(edges) for edges in inputs.values()]))
-
-  edges, components = edge_cutting(inputs)
+  graph = Graph.from_dict(inputs)
+
+  # Three wires hold the two halves together, so pushing more than three
+  # paths between the halves can't be done, and between nodes on the same
+  # side it always can.
+  found = cut_of_size(graph, 3)
+  if found is None:
+    raise Exception("no 3 wires split the graph in two")
+  cut, side = found
+  #print("cut:", [ graph.edge(a) for a in cut ])
+  inside = sum(side)
   # Attempt 1: 606062 - right.
-  return [len(c) for c in components]
-
-  # An attempt to run Kargers until we get a good answer...but didn't work.
-  answer = None
-  while not answer:
-    k = kargers(inputs)
-    cutresult = edge_cutting(k)
-    if not cutresult:
-      continue
-
-    edges, components = cutresult
-    c1, c2 = components
-    # inflate components.
-    for c in components:
-      expanded = set()
-      for name in c:
-        expanded.update(name.split("-"))
-      c.clear()
-      c.update(expanded)
-    #print(components)
-    print(edges, ":", [len(c) for c in components])
+  return inside * (len(graph) - inside)
 
 def PART2(inputs):
   return "no part 2!"
@@ -5,90 +5,66 @@ from dataclasses import dataclass
 from typing import NamedTuple
 from _.data.formatting.blocks import Block
 from _.data.structures.point import Point, EIGHTWAY
-from _.games.advent_of_code.utils import read_numbers
+from _.games.advent_of_code.utils import read_numbers, to_grid, Grid
 
 
 
 LOAD = "content"
 def REWRITE(lines):
-  grid = defaultdict(lambda: ".")
-  for y, line in enumerate(lines):
-    for x, c in enumerate(line):
-      grid[Point(x,y)] = c
-
-  return grid
+  return Grid.from_lines(lines)
 
 def TEST(inputs):
-  pass
-
-def search(grid, start, string):
-  assert(grid[start] == string[0])
-
-  # tuple(start, end)
-  found = []
-
-  for direction in EIGHTWAY:
-    index = 1
-    pos = start + direction
-    while index < len(string) and grid[pos] == string[index]:
-      index += 1
-      pos += direction
-
-    if index == len(string):
-      found.append((start, pos - direction))
-
-  return found
-
-def PART1(inputs):
-  print(inputs)
-  xs = set()
-  for key, value in inputs.items():
-    if value == "X":
-      xs.add(key)
-
-  print(xs)
+  # Grid against the dict to_grid makes, and back out to the same text.
+  text = str(inputs)
+  lines = text.split("\n")
+  if inputs.width == inputs.height:
+    old, _ = to_grid(lines)
+    assert dict(inputs.items()) == old
+  assert Grid.from_lines(lines) == inputs
+
+  # Ragged rows get padded, and the padding comes back out in str.
+  ragged = Grid.from_lines(["abc", "d", ""], fill=".")
+  assert (ragged.width, ragged.height) == (3, 3)
+  assert str(ragged) == "abc\nd..\n..."
+  assert Grid.from_lines(str(ragged).split("\n")) == ragged
+
+  # Not square: rows become columns.
+  wide = Grid.from_lines(["abc", "def"])
+  assert wide.transpose() == Grid.from_lines(["ad", "be", "cf"])
+  assert wide.transpose().transpose() == wide
+  assert wide.column(1) == wide.transpose().row(1)
+
+  # Shifting by any amount, against looking each cell up by hand.
+  for dx in range(-4, 5):
+    for dy in range(-3, 4):
+      shifted = wide.shift(dx, dy, ".")
+      for p, c in shifted.items():
+        assert c == wide.get(Point(p.x + dx, p.y + dy), "."), (dx, dy, p)
+
+def PART1(grid):
+  # Line up each cell with the 3 after it in every direction, and check the
+  # whole grid at once.
   count = 0
-  for x in xs:
-    f = search(inputs, x, "XMAS")
-    count += len(f)
+  for direction in EIGHTWAY:
+    shifted = [ grid.shift(direction.x * i, direction.y * i, ".").cells for i in range(4) ]
+    count += sum(1 for letters in zip(*shifted) if letters == ("X", "M", "A", "S"))
 
   # 2524
   return count
 
-def isMAS(grid, p1, p2):
-  l1, l2 = grid[p1], grid[p2]
+def isMAS(l1, l2):
   return l1 != l2 and l1 in "MS" and l2 in "MS"
 
-def checkMAS(grid, start):
-  assert(grid[start] == "A")
-
-  # We assume only one of cross or plus can match.
-  up = Point(0, 1)
-  right = Point(1, 0)
-  plus = isMAS(grid, start + up, start - up) and isMAS(grid, start + right, start - right)
-
-  tr = up + right
-  tl = up - right
-  cross = isMAS(grid, start + tr, start - tr) and isMAS(grid, start + tl, start - tl)
-
-  # ooooooh, this does not pass!
-  #assert(not(plus and cross))
-
-  # Oops, didn't need the plus check...
-  return int(cross)
-
-
 def PART2(grid):
-  aaah = set()
-  for key, value in grid.items():
-    if value == "A":
-      aaah.add(key)
- 
+  # Both diagonals through each A, the plus never needed checking.
+  ur, dl, ul, dr = [ grid.shift(dx, dy, ".").cells
+      for dx, dy in ((1, 1), (-1, -1), (-1, 1), (1, -1)) ]
+
   count = 0
-  for a in aaah:
-    count += checkMAS(grid, a)
+  for c, a1, a2, b1, b2 in zip(grid.cells, ur, dl, ul, dr):
+    if c == "A" and isMAS(a1, a2) and isMAS(b1, b2):
+      count += 1
 
   # attempt 1: 1904
   # attempt 2: 1873
   return count
-  pass
@@ -0,0 +1,196 @@
+#!/usr/bin/env python-mr
+
+# Timing, fixtures and result history for `main.py bench`.
+
+import collections
+import glob
+import json
+import os
+import re
+import resource
+import shlex
+import signal
+import subprocess
+import time
+
+
+BenchResult = collections.namedtuple("BenchResult",
+    ["year", "day", "fixture", "part", "wall", "cpu", "rss", "status"])
+# The order parts are run & reported in.
+PARTS = ["load", "read", "rewrite", "1", "2", "run"]
+
+
+def find_fixtures(dirname):
+  """Inputs a PART1/PART2 day can be run on: input.txt and test*.txt."""
+  found = []
+  for path in sorted(glob.glob(os.path.join(dirname, "*.txt"))):
+    name = os.path.basename(path)[:-len(".txt")]
+    if name == "input" or name.startswith("test"):
+      found.append((name, path))
+  return found
+
+
+__Diff = re.compile(r"diff <\(\./main\.py ([^)]*)\) (\S+)")
+
+def script_cases(dirname):
+  """Cases from a test.sh that diffs `./main.py ...` against expected output.
+
+  Returns (name, args, expected output path) for each of them.
+  """
+  cases = []
+  try:
+    with open(os.path.join(dirname, "test.sh")) as f:
+      script = f.read()
+  except FileNotFoundError:
+    return cases
+  for m in __Diff.finditer(script):
+    args = shlex.split(m.group(1))
+    name = os.path.basename(args[-1])
+    cases.append((name, args, os.path.join(dirname, m.group(2))))
+  return cases
+
+
+class SolverTimeout(Exception):
+  pass
+
+
+def _timeout(signum, frame):
+  raise SolverTimeout()
+
+
+def timed(fn, *args, timeout=None):
+  """Calls fn(*args), returns (status, value, wall, cpu).
+
+  Raising is reported in the status rather than passed on, and so is
+  running for longer than `timeout` seconds.
+  """
+  if timeout:
+    signal.signal(signal.SIGALRM, _timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+  wall, cpu = time.perf_counter(), time.process_time()
+  status, value = "ok", None
+  try:
+    value = fn(*args)
+  except SolverTimeout:
+    status = "timeout"
+  except Exception as e:
+    status = "error: {}".format(type(e).__name__)
+  finally:
+    if timeout:
+      signal.setitimer(signal.ITIMER_REAL, 0)
+  return status, value, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+  return resource.getrusage(who).ru_maxrss
+
+
+class Best(object):
+  """Keeps the fastest of repeated runs of one part, any failure sticks."""
+  def __init__(self, year, day, fixture, part):
+    self.key = (year, day, fixture, part)
+    self.wall = None
+    self.cpu = None
+    self.status = "ok"
+
+  def add(self, status, wall, cpu):
+    if status != "ok":
+      self.status = status
+    if self.wall is None or wall < self.wall:
+      self.wall, self.cpu = wall, cpu
+
+  def result(self, rss):
+    return BenchResult(*self.key, self.wall, self.cpu, rss, self.status)
+
+
+def bench_script(task):
+  """Runs one test.sh case as a subprocess, checking its output."""
+  year, day, dirname, name, args, expected, repeat, timeout = task
+  best = Best(year, day, name, "run")
+  with open(expected) as f:
+    want = f.read()
+  for _ in range(repeat):
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    wall = time.perf_counter()
+    try:
+      proc = subprocess.run(["./main.py"] + args, cwd=dirname,
+          capture_output=True, text=True, timeout=timeout)
+      status = "ok" if proc.stdout == want else "wrong output"
+    except subprocess.TimeoutExpired:
+      status = "timeout"
+    wall = time.perf_counter() - wall
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    best.add(status, wall, cpu)
+    if status != "ok":
+      break
+  return [best.result(peak_rss(resource.RUSAGE_CHILDREN))]
+
+
+def result_key(r):
+  return "{}/day-{:02}/{}/{}".format(r.year, r.day, r.fixture, r.part)
+
+
+class History(object):
+  """Past bench results, kept as JSON: key -> list of runs, oldest first."""
+  # How many past runs a result gets compared against.
+  WINDOW = 5
+  # Differences smaller than this (in seconds) are noise, never regressions.
+  NOISE = 0.01
+
+  def __init__(self, path):
+    self.path = path
+    self.runs = {}
+    if os.path.exists(path):
+      with open(path) as f:
+        self.runs = json.load(f)
+
+  def baseline(self, key):
+    """Best wall time of the last few good runs, None without any."""
+    walls = [ r["wall"] for r in self.runs.get(key, [])[-History.WINDOW:]
+        if r["status"] == "ok" ]
+    return min(walls) if walls else None
+
+  def regressions(self, results, threshold):
+    """Results more than `threshold` (0.2 is 20%) slower than the baseline.
+
+    Returns (result, baseline) pairs.
+    """
+    slow = []
+    for r in results:
+      if r.status != "ok":
+        continue
+      base = self.baseline(result_key(r))
+      if (base is not None and r.wall > base * (1 + threshold)
+          and r.wall - base > History.NOISE):
+        slow.append((r, base))
+    return slow
+
+  def record(self, results, when=None):
+    when = when or time.time()
+    for r in results:
+      self.runs.setdefault(result_key(r), []).append({
+        "time": when, "wall": r.wall, "cpu": r.cpu, "rss": r.rss,
+        "status": r.status,
+      })
+
+  def save(self):
+    tmp = self.path + ".tmp"
+    with open(tmp, "w") as f:
+      json.dump(self.runs, f, indent=1, sort_keys=True)
+    os.replace(tmp, self.path)
+
+
+def table(results, slow=()):
+  slow = { result_key(r): base for r, base in slow }
+  lines = ["year day fixture    part     wall(s)    cpu(s)  rss(MiB) status"]
+  for r in results:
+    status = r.status
+    base = slow.get(result_key(r))
+    if base is not None:
+      status = "slower x{:.2f} (was {:.3f}s)".format(r.wall / base, base)
+    lines.append("{:4} {:3} {:10} {:>7} {:10.3f} {:9.3f} {:9.1f} {}".format(
+        r.year, r.day, r.fixture[:10], r.part, r.wall, r.cpu, r.rss / 1024, status))
+  lines.append("total {:30.3f} {:9.3f}".format(
+      sum(r.wall for r in results), sum(r.cpu for r in results)))
+  return "\n".join(lines)
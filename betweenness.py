@@ -0,0 +1,134 @@
+#!/usr/bin/env python-mr
+
+# Sampled edge betweenness: how many shortest paths go over each edge.
+#
+# Graphs come in CSR form, as three int arrays: node n's neighbours are
+# targets[offsets[n]:offsets[n + 1]], over the edges with the same indexes
+# in `edges`.
+
+import array
+import multiprocessing
+import random
+from multiprocessing import shared_memory
+
+from _.games.advent_of_code.utils import can_pool
+
+
+def single_source(offsets, targets, edges, source, scores):
+  """Brandes' pass from one source, adding to scores[edge]."""
+  n = len(offsets) - 1
+  dist = [-1] * n
+  # Shortest paths from the source to each node.
+  paths = [0] * n
+  dist[source] = 0
+  paths[source] = 1
+  order = [source]
+  for v in order:
+    d = dist[v] + 1
+    for i in range(offsets[v], offsets[v + 1]):
+      w = targets[i]
+      if dist[w] < 0:
+        dist[w] = d
+        order.append(w)
+      if dist[w] == d:
+        paths[w] += paths[v]
+
+  # Share of the paths ending past each node, nearest last.
+  below = [0.0] * n
+  for w in reversed(order):
+    d = dist[w] - 1
+    share = (1 + below[w]) / paths[w]
+    for i in range(offsets[w], offsets[w + 1]):
+      v = targets[i]
+      if dist[v] == d:
+        c = paths[v] * share
+        scores[edges[i]] += c
+        below[v] += c
+
+
+def _passes(csr, sources):
+  offsets, targets, edges, count = csr
+  scores = [0.0] * count
+  for s in sources:
+    single_source(offsets, targets, edges, s, scores)
+  return scores
+
+
+# Workers attach to the graph's shared memory blocks when they start, and
+# keep them in _blocks so they stay mapped under the CSR views.
+_blocks = None
+_csr = None
+
+def _init_worker(names, count):
+  global _blocks, _csr
+  _blocks = [ shared_memory.SharedMemory(name=name) for name in names ]
+  offsets, targets, edges = [ b.buf.cast("i") for b in _blocks ]
+  _csr = (offsets, targets, edges, count)
+
+
+def _sample(sources):
+  return _passes(_csr, sources)
+
+
+def _share(arrays):
+  blocks = []
+  for a in arrays:
+    b = shared_memory.SharedMemory(create=True, size=max(1, len(a) * a.itemsize))
+    b.buf[:len(a) * a.itemsize] = a.tobytes()
+    blocks.append(b)
+  return blocks
+
+
+def _converge(parts, batches, count, top, stable):
+  scores = [0.0] * count
+  used = 0
+  leaders = None
+  streak = 0
+  for b, part in zip(batches, parts):
+    for i, s in enumerate(part):
+      scores[i] += s
+    used += len(b)
+    now = set(sorted(range(count), key=scores.__getitem__)[-top:])
+    streak = streak + 1 if now == leaders else 0
+    leaders = now
+    if streak >= stable:
+      break
+  return (scores, used)
+
+
+# Below this many nodes a pass is quicker than starting a pool.
+SERIAL_NODES = 10000
+
+
+def edge_betweenness(offsets, targets, edges, count, top=3, batch=8, stable=4,
+    jobs=None, seed=0, serial=SERIAL_NODES):
+  """Betweenness of every edge, from as few random sources as it takes.
+
+  Sources get run `batch` at a time, and it stops once the `top` highest
+  edges have come out the same after `stable` batches in a row (or every
+  node has been a source). The batches run on a pool of `jobs` workers,
+  sharing the graph through shared memory, unless the graph has fewer
+  than `serial` nodes.
+
+  Returns (scores, sources used).
+  """
+  rng = random.Random(seed)
+  sources = list(range(len(offsets) - 1))
+  rng.shuffle(sources)
+  batches = [ sources[i:i + batch] for i in range(0, len(sources), batch) ]
+
+  csr = (array.array("i", offsets), array.array("i", targets), array.array("i", edges))
+  if not can_pool(jobs) or len(sources) < serial:
+    parts = (_passes(csr + (count,), b) for b in batches)
+    return _converge(parts, batches, count, top, stable)
+
+  blocks = _share(csr)
+  try:
+    with multiprocessing.Pool(jobs, _init_worker, ([ b.name for b in blocks ], count)) as pool:
+      # In order, so the same seed always stops at the same place. Leaving
+      # the with block terminates whatever is left.
+      return _converge(pool.imap(_sample, batches), batches, count, top, stable)
+  finally:
+    for b in blocks:
+      b.close()
+      b.unlink()
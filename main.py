@@ -1,8 +1,17 @@
 #!/usr/bin/env python-mr
 
+import array
+import bisect
 import collections
+import collections.abc
+import contextlib
+import glob
 import inspect
+import itertools
 import importlib
+import mmap
+import multiprocessing
+import operator
 import os
 import re
 import subprocess
@@ -12,16 +21,23 @@ import typing
 from _.command_line.app import APP
 from _.command_line.flags import Flag
 from _.repo.python.location import REPO_LOCATION
+from _.games.advent_of_code import benchmark
 
 FLAG_input = Flag.str("input", short="i", description="Puzzle input file.")
 FLAG_test = Flag.bool("test", description="Use test input instead of real input.")
 FLAG_year = Flag.int("year", short="Y", default=-1)
 FLAG_day = Flag.int("day", short="D", default=-1)
+FLAG_timeout = Flag.int("timeout", default=60, description="Seconds each part gets in bench.")
+FLAG_jobs = Flag.int("jobs", short="j", default=0, description="Processes bench runs, 0 for one per cpu.")
+FLAG_repeat = Flag.int("repeat", default=3, description="Runs of each part in bench, the fastest is kept.")
+FLAG_history = Flag.str("history", description="Bench history file, defaults to bench-history.json in the root.")
+FLAG_threshold = Flag.int("threshold", default=20, description="Percent slower than its history before bench flags a part.")
+FLAG_record = Flag.bool("record", description="Add this bench run to the history.")
 
 
 ROOT = os.path.join(REPO_LOCATION, "games", "advent-of-code")
 
-def challenge_path():
+def challenge():
   year = FLAG_year.value
   if year == -1:
     year = int(os.getenv("ADVENT_YEAR"))
@@ -29,11 +45,18 @@ def challenge_path():
   day = FLAG_day.value
   if day == -1:
     day = int(os.getenv("ADVENT_DAY"))
-  dirname = os.path.join(ROOT, str(year), "day-{:02}".format(day))
-  return dirname
+  return year, day
 
 
-def load_input(filename=None):
+def day_path(year, day):
+  return os.path.join(ROOT, str(year), "day-{:02}".format(day))
+
+
+def challenge_path():
+  return day_path(*challenge())
+
+
+def input_filename(filename=None):
   if not filename:
     filename = FLAG_input.value
   if not filename:
@@ -42,6 +65,11 @@ def load_input(filename=None):
       filename = os.path.join(dirname, "test.txt")
     else:
       filename = os.path.join(dirname, "input.txt")
+  return filename
+
+
+def load_input(filename=None):
+  filename = input_filename(filename)
 
   contents = []
   with open(filename, 'r') as f:
@@ -69,28 +97,221 @@ def load_groups(filename=None):
   return contents
 
 
+class MappedLines(collections.abc.Sequence):
+  """Lines of a file, read through an mmap of it.
+
+  Only the offset of each line is kept, a line becomes a str (or bytes, when
+  binary) when it's indexed, stripped the same way load_input does it.
+  Slicing gives another view of the same buffer.
+
+  Lines end at "\n" only. load_input reads in text mode, where a bare "\r"
+  ends a line too, so files with old Mac line endings come out as one long
+  line here. "\r\n" is the same either way, strip() drops the "\r".
+  """
+  __slots__ = ("_buf", "_starts", "_lo", "_hi", "_binary")
+  CHUNK = 1 << 20
+  # The newline before each blank line.
+  BLANK = re.compile(rb"\n(?=[ \t\r\x0b\x0c]*(?:\n|\Z))")
+
+  def __init__(self, buf, starts, lo, hi, binary):
+    self._buf = buf
+    # Offset of every line, plus the end of the last one.
+    self._starts = starts
+    self._lo = lo
+    self._hi = hi
+    self._binary = binary
+
+  @staticmethod
+  def open(filename, binary=False):
+    with open(filename, 'rb') as f:
+      size = os.fstat(f.fileno()).st_size
+      # Can't map an empty file.
+      buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+    # Splitting a chunk at a time keeps finding the lines out of python.
+    starts = array.array('q', [0])
+    for off in range(0, size, MappedLines.CHUNK):
+      lines = buf[off:off + MappedLines.CHUNK].split(b"\n")
+      lines.pop()
+      starts.extend(itertools.islice(itertools.accumulate(
+          map(operator.add, map(len, lines), itertools.repeat(1)), initial=off), 1, None))
+    if starts[-1] != size:
+      # No newline at the end.
+      starts.append(size)
+    return MappedLines(buf, starts, 0, len(starts) - 1, binary)
+
+  def _line(self, i):
+    line = self._buf[self._starts[i]:self._starts[i + 1]].strip()
+    return line if self._binary else line.decode()
+
+  def __len__(self):
+    return self._hi - self._lo
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      lo, hi, step = index.indices(len(self))
+      if step != 1:
+        return [ self[i] for i in range(lo, hi, step) ]
+      return MappedLines(self._buf, self._starts, self._lo + lo,
+          self._lo + max(lo, hi), self._binary)
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("line index out of range")
+    return self._line(self._lo + index)
+
+  def __iter__(self):
+    for i in range(self._lo, self._hi):
+      yield self._line(i)
+
+  def groups(self):
+    """Views of the runs of lines between blank lines, like load_groups."""
+    groups = []
+    lo = self._lo
+    if lo < self._hi and not self._line(lo):
+      groups.append(MappedLines(self._buf, self._starts, lo, lo, self._binary))
+      lo += 1
+    end = self._starts[self._hi]
+    for m in MappedLines.BLANK.finditer(self._buf, self._starts[self._lo], end):
+      if m.end() == end:
+        break
+      i = bisect.bisect_left(self._starts, m.end(), lo, self._hi)
+      groups.append(MappedLines(self._buf, self._starts, lo, i, self._binary))
+      lo = i + 1
+    if lo < self._hi:
+      groups.append(MappedLines(self._buf, self._starts, lo, self._hi, self._binary))
+    return groups
+
+  def __repr__(self):
+    return "MappedLines({} lines)".format(len(self))
+
+
+def load_mapped(filename=None):
+  """Same lines as load_input, without reading the whole file up front.
+
+  Unless the file ends lines with a bare "\r", see MappedLines.
+  """
+  return MappedLines.open(input_filename(filename))
+
+
+def load_mapped_groups(filename=None):
+  return MappedLines.open(input_filename(filename)).groups()
+
+
+def load_bytes(filename=None):
+  """load_mapped giving bytes lines, for grids that only need to index them."""
+  return MappedLines.open(input_filename(filename), binary=True)
+
+
+def day_module(year, day):
+  return "_.games.advent_of_code.{}.day-{:02}.main".format(year, day)
+
+
 def find_module():
-  year = FLAG_year.value
-  if year == -1:
-    year = int(os.getenv("ADVENT_YEAR"))
+  return day_module(*challenge())
+
+
+def find_days(year=-1):
+  """(year, day, dirname) for every day directory."""
+  found = []
+  for dirname in glob.glob(os.path.join(ROOT, "[0-9]" * 4, "day-[0-9][0-9]")):
+    y = int(os.path.basename(os.path.dirname(dirname)))
+    d = int(os.path.basename(dirname)[len("day-"):])
+    if year == -1 or y == year:
+      found.append((y, d, dirname))
+  return sorted(found)
+
+
+def has_parts(dirname):
+  """Whether the day's main.py defines PART1 or PART2."""
+  try:
+    with open(os.path.join(dirname, "main.py")) as f:
+      return re.search(r"^(def )?PART[12]\b", f.read(), re.MULTILINE) is not None
+  except FileNotFoundError:
+    return False
+
+
+def bench_solver(task):
+  """Times every part of one day on one fixture, in a pool worker of its own.
+
+  Every solver gets a fresh process (maxtasksperchild=1), so peak RSS is
+  that of the solver alone. Each repeat starts again from reading the
+  input, parts are free to modify what they're given.
+  """
+  year, day, fixture, filename, repeat, timeout = task
+  runner = AdventRunner()
+  parts = {}
+  def record(part, fn, *args):
+    if part not in parts:
+      parts[part] = benchmark.Best(year, day, fixture, part)
+    status, value, wall, cpu = benchmark.timed(fn, *args, timeout=timeout)
+    parts[part].add(status, wall, cpu)
+    return status, value
+
+  with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+    status, m = record("load", importlib.import_module, day_module(year, day))
+    for _ in range(repeat if status == "ok" else 0):
+      status, raw = record("read", runner._load, m, filename)
+      if status != "ok":
+        break
+      status, data = record("rewrite", runner._apply_rewrite, m, raw)
+      if status != "ok":
+        break
+      r1 = None
+      if hasattr(m, "PART1"):
+        status, r1 = record("1", m.PART1, data)
+      if hasattr(m, "PART2"):
+        if len(inspect.signature(m.PART2).parameters) == 2:
+          status, _ = record("2", m.PART2, data, r1)
+        else:
+          status, _ = record("2", m.PART2, data)
+      if any(p.status != "ok" for p in parts.values()):
+        break
+
+  rss = benchmark.peak_rss()
+  return [ p.result(rss) for p in parts.values() ]
+
+
+def bench(days, test=False, repeat=1, timeout=60, jobs=None):
+  """Benchmarks every fixture of the given days.
+
+  Days with PART1/PART2 are run on input.txt, or their test*.txt files when
+  `test` is set. Script days are run through their test.sh cases.
+  """
+  tasks = []
+  for year, day, dirname in days:
+    if has_parts(dirname):
+      for fixture, filename in benchmark.find_fixtures(dirname):
+        if (fixture != "input") == test:
+          tasks.append((bench_solver,
+              (year, day, fixture, filename, repeat, timeout)))
+    else:
+      for name, args, expected in benchmark.script_cases(dirname):
+        tasks.append((benchmark.bench_script,
+            (year, day, dirname, name, args, expected, repeat, timeout)))
 
-  day = FLAG_day.value
-  if day == -1:
-    day = int(os.getenv("ADVENT_DAY"))
-  return "_.games.advent_of_code.{}.day-{:02}.main".format(year, day)
+  results = []
+  with multiprocessing.Pool(jobs, maxtasksperchild=1) as pool:
+    pending = [ pool.apply_async(fn, (task,)) for fn, task in tasks ]
+    for p in pending:
+      results.extend(p.get())
+  results.sort(key=lambda r: (r.year, r.day, r.fixture, benchmark.PARTS.index(r.part)))
+  return results
 
 
 class AdventRunner:
   LOAD = {
     "content": load_input,
     "groups": load_groups,
+    "mapped": load_mapped,
+    "mapped_groups": load_mapped_groups,
+    "bytes": load_bytes,
   }
 
-  def _load(self, module):
+  def _load(self, module, filename=None):
     choice = "content"
     if hasattr(module, "LOAD"):
       choice = module.LOAD
-    return AdventRunner.LOAD[choice]()
+    return AdventRunner.LOAD[choice](filename)
 
   def _rewrite(self, module):
     if hasattr(module, "REWRITE"):
@@ -128,17 +349,38 @@ class AdventRunner:
     # For some reason http2 seems to have problems when inside python.
     subprocess.run(["curl", "--http1.1", url, "--cookie", cookie, "-o", infile])
 
+  def _prepare(self, module, filename=None):
+    return self._apply_rewrite(module, self._load(module, filename))
+
+  def _apply_rewrite(self, module, raw):
+    rewrite = self._rewrite(module)
+    if isinstance(rewrite, list):
+      assert len(raw) == len(rewrite), "Mismatch in group size & rewrites"
+      return [fn(r) for fn, r in zip(rewrite, raw)]
+    return rewrite(raw)
+
+  def __bench(self):
+    days = find_days(FLAG_year.value)
+    if FLAG_day.value != -1:
+      days = [ d for d in days if d[1] == FLAG_day.value ]
+    results = bench(days, FLAG_test.value, FLAG_repeat.value,
+        FLAG_timeout.value, FLAG_jobs.value or None)
+
+    history = benchmark.History(
+        FLAG_history.value or os.path.join(ROOT, "bench-history.json"))
+    slow = history.regressions(results, FLAG_threshold.value / 100)
+    print(benchmark.table(results, slow))
+    if slow:
+      print("{} parts regressed by more than {}%".format(len(slow), FLAG_threshold.value))
+    if FLAG_record.value:
+      history.record(results)
+      history.save()
+
   def __main(self):
     module = find_module()
     m = importlib.import_module(module)
 
-    raw = self._load(m)
-    rewrite = self._rewrite(m)
-    if isinstance(rewrite, list):
-      assert len(raw) == len(rewrite), "Mismatch in group size & rewrites"
-      data = [fn(r) for fn, r in zip(rewrite, raw)]
-    else:
-      data = rewrite(raw)
+    data = self._prepare(m)
 
     if hasattr(m, "TEST"):
       m.TEST(data)
@@ -158,6 +400,8 @@ class AdventRunner:
   def run(self):
     APP.register_command("fetch", self.__fetch_input)
     APP.register_command("edit", self.__edit)
+    APP.register_command("bench", self.__bench)
+    APP.register_command("all", self.__bench)
     APP.run(self.__main)
 
 
@@ -0,0 +1,89 @@
+import array
+import heapq
+import itertools
+
+# Shortest paths over any graph: states are anything hashable, and
+# moves(state) yields (cost, next_state) for every way out of it.
+
+
+def shortest_path(starts, moves, goal, heuristic=None):
+  """Dijkstra over a binary heap, A* when given a heuristic.
+
+  heuristic(state) has to be a consistent lower bound on the cost left,
+  otherwise the first goal reached might not be the cheapest.
+  Returns (cost, state) for the first goal(state) reached, None if there
+  isn't one.
+  """
+  best = {}
+  heap = []
+  # Breaks ties without ever comparing states.
+  order = itertools.count()
+  for s in starts:
+    best[s] = 0
+    heapq.heappush(heap, (heuristic(s) if heuristic else 0, next(order), 0, s))
+
+  while heap:
+    _, _, cost, state = heapq.heappop(heap)
+    if best[state] != cost:
+      # Was queued again for less.
+      continue
+    if goal(state):
+      return (cost, state)
+
+    for step, n in moves(state):
+      c = cost + step
+      if c < best.get(n, c + 1):
+        best[n] = c
+        heapq.heappush(heap, (c + heuristic(n) if heuristic else c, next(order), c, n))
+
+  return None
+
+
+class _Costs(array.array):
+  """Costs of states 0 .. n - 1, in place of a dict with an entry each."""
+  UNSEEN = 2 ** 62
+
+  def __new__(cls, n):
+    return super().__new__(cls, "q", (array.array("q", [_Costs.UNSEEN]) * n).tobytes())
+
+  def get(self, state, default):
+    return self[state]
+
+
+def shortest_path_dial(starts, moves, goal, max_step, states=None):
+  """Dijkstra over a bucket queue (Dial's algorithm).
+
+  Only for small non-negative integer move costs, no more than max_step.
+  Each bucket holds the states at one cost, and since nothing queued costs
+  more than max_step above the cheapest, max_step + 1 buckets get reused
+  in a circle. When the states are the ints 0 .. states - 1 their costs
+  are kept in one flat array. Returns the same as shortest_path.
+  """
+  size = max_step + 1
+  buckets = [ [] for _ in range(size) ]
+  best = {} if states is None else _Costs(states)
+  for s in starts:
+    best[s] = 0
+    buckets[0].append(s)
+  queued = len(buckets[0])
+
+  cost = 0
+  while queued:
+    bucket = buckets[cost % size]
+    while bucket:
+      state = bucket.pop()
+      queued -= 1
+      if best[state] != cost:
+        # Was queued again for less.
+        continue
+      if goal(state):
+        return (cost, state)
+      for step, n in moves(state):
+        c = cost + step
+        if c < best.get(n, c + 1):
+          best[n] = c
+          buckets[c % size].append(n)
+          queued += 1
+    cost += 1
+
+  return None
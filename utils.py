@@ -1,5 +1,6 @@
 import re
 import math
+import multiprocessing
 
 from _.data.structures.point import Point, ZERO
 
@@ -106,6 +107,14 @@ def factors(number):
   assert number == 1
   return factors
 
+def can_pool(jobs):
+  """Whether work split `jobs` ways should go to a multiprocessing pool.
+
+  Not for jobs == 1, and not from inside a pool worker, since those can't
+  start pools of their own (main.py bench runs each solver in one).
+  """
+  return jobs != 1 and not multiprocessing.current_process().daemon
+
 def to_grid(lines, discard="", transform=lambda x: x):
   # Check square.
   assert(len(lines) == len(lines[0]))
@@ -122,13 +131,136 @@ def grid_display(size, lookup, default=" "):
   assert(len(default) == 1)
   lines = []
   for y in range(size):
-    line = ""
-    for x in range(size):
-      p = Point(x, y)
-      c = lookup(p)
-      if not c:
-        c = default
-      line += c
-    lines.append(line)
+    lines.append("".join([ lookup(Point(x, y)) or default for x in range(size) ]))
   return "\n".join(lines)
 
+
+class Grid(object):
+  """Dense rectangular grid, the cells are kept row by row in one flat list.
+
+  Positions are Points (anything with x & y works). Whole grid operations
+  (shift, map, count, str) work on the flat list or a row at a time, rather
+  than looking up every cell by position.
+  """
+  def __init__(self, width, height, cells):
+    assert(len(cells) == width * height)
+    self.width = width
+    self.height = height
+    self.cells = cells
+
+  @staticmethod
+  def from_lines(lines, transform=None, fill=" "):
+    """Rows shorter than the longest one are padded out with fill."""
+    width = max((len(line) for line in lines), default=0)
+    cells = []
+    for line in lines:
+      cells.extend(line)
+      if len(line) < width:
+        cells.extend(fill * (width - len(line)))
+    if transform:
+      cells = list(map(transform, cells))
+    return Grid(width, len(lines), cells)
+
+  @staticmethod
+  def filled(width, height, value):
+    return Grid(width, height, [value] * (width * height))
+
+  def index(self, p):
+    """Offset of p in cells, None when it's outside the grid."""
+    if 0 <= p.x < self.width and 0 <= p.y < self.height:
+      return p.y * self.width + p.x
+    return None
+
+  def position(self, index):
+    y, x = divmod(index, self.width)
+    return Point(x, y)
+
+  def __contains__(self, p):
+    return 0 <= p.x < self.width and 0 <= p.y < self.height
+
+  def __getitem__(self, p):
+    i = self.index(p)
+    if i is None:
+      raise IndexError("{} outside of {}x{} grid".format(p, self.width, self.height))
+    return self.cells[i]
+
+  def __setitem__(self, p, value):
+    i = self.index(p)
+    if i is None:
+      raise IndexError("{} outside of {}x{} grid".format(p, self.width, self.height))
+    self.cells[i] = value
+
+  def get(self, p, default=None):
+    i = self.index(p)
+    return default if i is None else self.cells[i]
+
+  def items(self):
+    for i, value in enumerate(self.cells):
+      yield self.position(i), value
+
+  def find(self, value):
+    """Positions of every cell equal to value."""
+    return [ self.position(i) for i, c in enumerate(self.cells) if c == value ]
+
+  def count(self, value):
+    return self.cells.count(value)
+
+  def neighbors(self, p, directions):
+    """p + d for each direction that's still inside the grid."""
+    return [ p + d for d in directions if (p + d) in self ]
+
+  def row(self, y):
+    return self.cells[y * self.width:(y + 1) * self.width]
+
+  def rows(self):
+    return [ self.row(y) for y in range(self.height) ]
+
+  def column(self, x):
+    return self.cells[x::self.width]
+
+  def transpose(self):
+    cells = []
+    for x in range(self.width):
+      cells.extend(self.cells[x::self.width])
+    return Grid(self.height, self.width, cells)
+
+  def map(self, fn):
+    return Grid(self.width, self.height, list(map(fn, self.cells)))
+
+  def copy(self):
+    return Grid(self.width, self.height, list(self.cells))
+
+  def shift(self, dx, dy, fill=None):
+    """Grid with the cell at (x + dx, y + dy) in (x, y), fill where that's outside.
+
+    Combining shifted grids cell by cell (zip over their cells) compares
+    every cell with a neighbor in one pass.
+    """
+    w, h = self.width, self.height
+    blank = [fill] * w
+    pad = [fill] * min(abs(dx), w)
+    cells = []
+    for y in range(h):
+      sy = y + dy
+      if not 0 <= sy < h:
+        cells.extend(blank)
+        continue
+      row = self.cells[sy * w:(sy + 1) * w]
+      if dx >= 0:
+        cells.extend(row[dx:])
+        cells.extend(pad)
+      else:
+        cells.extend(pad)
+        cells.extend(row[:max(w + dx, 0)])
+    return Grid(w, h, cells)
+
+  def __eq__(self, other):
+    return (isinstance(other, Grid) and self.width == other.width
+        and self.height == other.height and self.cells == other.cells)
+
+  def __str__(self):
+    cells, w = self.cells, self.width
+    return "\n".join([ "".join(map(str, cells[i:i + w])) for i in range(0, len(cells), w) ])
+
+  def __repr__(self):
+    return "Grid({}x{})".format(self.width, self.height)